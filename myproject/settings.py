@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from celery.schedules import crontab
 from dotenv import load_dotenv
 from pathlib import Path
 import os
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'receipes',
     'django_celery_results',
+    'django_celery_beat',
 ]
 
 MIDDLEWARE = [
@@ -65,12 +67,24 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'receipes.context_processors.unread_notifications',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
+ASGI_APPLICATION = 'myproject.asgi.application'
+
+# Channel layer carrying notification pushes to WebSocket consumers. The
+# in-memory layer only reaches sockets in the same process (fine for local
+# testing); deployments with separate Celery workers need a shared layer such
+# as channels_redis.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -97,6 +111,17 @@ DATABASES = {
 
 
 
+# Cache
+# Used for the recipe list / card cache (see receipes/caching.py). Point this at a
+# shared backend such as Redis or Memcached when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -135,12 +160,39 @@ STATIC_URL = 'static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# How MEDIA_URL is served (see receipes/media.py): "django" streams files from
+# Python, "x-sendfile" (Apache) or "x-accel-redirect" (nginx) hand the transfer
+# to the front server, "" leaves MEDIA_URL to the front server entirely.
+MEDIA_SERVE = os.getenv('MEDIA_SERVE', 'django' if DEBUG else '')
+# nginx "internal" location aliased to MEDIA_ROOT, used by "x-accel-redirect".
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Cache lifetime, in seconds, of media whose names are not content hashes.
+MEDIA_MAX_AGE = 60 * 60
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Seconds after which the in-memory autocomplete index is rebuilt in the
+# background even if no recipe change was announced through the cache.
+AUTOCOMPLETE_REFRESH_SECONDS = 300
+
+# Number of mean-score votes every recipe starts with on the top-rated
+# leaderboard, so a handful of ratings cannot outrank a well-established recipe.
+LEADERBOARD_MIN_VOTES = 10
+
+# Uploads are streamed to temporary files (past FILE_UPLOAD_MAX_MEMORY_SIZE) and
+# any file over RECIPE_IMAGE_MAX_UPLOAD_SIZE is dropped while it is received.
+FILE_UPLOAD_HANDLERS = [
+    'receipes.uploads.SizeLimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # bytes
+# Longest side, in pixels, an uploaded recipe image is scaled down to.
+RECIPE_IMAGE_MAX_DIMENSION = 2560
+
 
 # AUTH_USER_MODEL = 'myproject.CustomUser'
 
@@ -148,6 +200,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CELERY_BROKER_URL = f'amqp://{os.getenv("RABBITMQ_USER")}:{os.getenv("RABBITMQ_PASSWORD")}@{os.getenv("RABBITMQ_HOST")}:{os.getenv("RABBITMQ_PORT")}/'
 CELERY_RESULT_BACKEND = 'django-db'  # Use Django database (MySQL) as result backend
 CELERY_CACHE_BACKEND = 'django-cache'
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'refresh-leaderboard': {
+        'task': 'receipes.tasks.refresh_leaderboard',
+        'schedule': 60 * 5,  # seconds
+    },
+    'collect-image-blobs': {
+        'task': 'receipes.tasks.collect_image_blobs',
+        'schedule': 60 * 60,  # seconds
+    },
+    'send-hourly-notification-digests': {
+        'task': 'receipes.tasks.send_notification_digests',
+        'schedule': crontab(minute=0),
+        'args': ('hourly',),
+    },
+    'send-daily-notification-digests': {
+        'task': 'receipes.tasks.send_notification_digests',
+        'schedule': crontab(minute=0, hour=7),
+        'args': ('daily',),
+    },
+}
 
 
 # Email Configuration
@@ -157,4 +230,8 @@ EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
-DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
\ No newline at end of file
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+# Open SMTP connections a worker process keeps between notification tasks,
+# and how many seconds an unused one is kept (see receipes/mailpool.py).
+EMAIL_POOL_SIZE = 2
+EMAIL_POOL_IDLE_TIMEOUT = 60
\ No newline at end of file
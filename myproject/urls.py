@@ -21,7 +21,8 @@ from django.urls import path
 from receipes.views import recipe_detail,add_collection,collection_detail,collection_list,send_test_email,follow_user,unfollow_user,user_profile,notifications,mark_notification_as_read,user_activity,popular_recipes,add_recipe_to_collection,delete_collection,delete_recipe_from_collection,delete_comment,delete_rating,user_following
 from receipes.views import RegisterView,HomeView,LogoutView,CreateRecipeView,LoginView,UpdateRecipeView,DeleteRecipeView,UserRecipesView
 from receipes.views import ProfileUpdateView,ProfileDetailView
-from receipes.views import UpdateCommentView
+from receipes.views import UpdateCommentView,TopRatedView
+from receipes.views import autocomplete_view,recipe_comments_page,recipe_ratings_page,mark_notifications_read
 
 
 urlpatterns = [
@@ -32,6 +33,7 @@ urlpatterns = [
     path('profile/edit', ProfileUpdateView.as_view(), name='profile_edit'),
     path('profile/', ProfileDetailView.as_view(), name='profile_view'),
     path('',HomeView.as_view(),name='home'),
+    path('autocomplete/', autocomplete_view, name='autocomplete'),
     path('logout/', LogoutView.as_view(), name='logout'),
 
 
@@ -39,7 +41,10 @@ urlpatterns = [
     path('update_recipe/<int:pk>/', UpdateRecipeView.as_view(), name='update_recipe'),
     path('delete_recipe/<int:pk>/', DeleteRecipeView.as_view(), name='delete_recipe'),
     path('recipe_detail/<int:pk>/', recipe_detail, name='recipe_detail'),
+    path('recipe_detail/<int:pk>/comments/', recipe_comments_page, name='recipe_comments_page'),
+    path('recipe_detail/<int:pk>/ratings/', recipe_ratings_page, name='recipe_ratings_page'),
     path('user_recipes/', UserRecipesView.as_view(), name='user_recipes'),
+    path('top_rated/', TopRatedView.as_view(), name='top_rated'),
 
     path('update_comment/<int:comment_id>/', UpdateCommentView.as_view(), name='update_comment'),
     path('delete_comment/<int:comment_id>/', delete_comment, name='delete_comment'),
@@ -60,14 +65,19 @@ urlpatterns = [
     path('user/<int:user_id>/following/', user_following, name='user_following'),
     path('notifications/', notifications, name='notifications'),
     path('notifications/mark-as-read/<int:notification_id>/', mark_notification_as_read, name='mark_notification_as_read'),
+    path('notifications/mark-read/', mark_notifications_read, name='mark_notifications_read'),
 
     path('admin/popular_recipes/',popular_recipes, name='popular_recipes'),
     path('admin/user_activity/', user_activity, name='user_activity'),
 ]
 
 
+import re
 from django.conf import settings
-from django.conf.urls.static import static
+from django.urls import re_path
+from receipes import media
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if settings.MEDIA_SERVE:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media.serve, name='media'),
+    ]
\ No newline at end of file
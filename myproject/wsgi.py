@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_wsgi_application()
+
+# Build in-memory indexes before the first request instead of on it.
+from receipes import autocomplete  # noqa: E402
+
+autocomplete.index.warm()
@@ -7,10 +7,12 @@ from django.urls import path, reverse
 from django.utils.html import format_html
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Count
+from django.core.paginator import Paginator
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib.admin.views.decorators import staff_member_required
-from receipes.models import Profile, Recipe, RecipeCollection, Comment, Rating, UserFollow
+from receipes import facets, leaderboard
+from receipes.models import Profile, Recipe, RecipeCollection, Comment, Rating, UserFollow, LeaderboardState
 
 class ProfileInline(admin.StackedInline):  #vertically layout within the admin form  
     model = Profile
@@ -155,7 +157,7 @@ class RecipeAdmin(admin.ModelAdmin):
     comment_count.short_description = 'Comments'
 
     def rating_count(self, obj):
-        count = obj.ratings.count()
+        count = obj.rating_count  # denormalized on the recipe row
         url = reverse('admin:recipe_ratings', args=[obj.id])
         return format_html('<a href="{}">{}</a>', url, count)
     rating_count.short_description = 'Ratings'
@@ -205,6 +207,22 @@ class PopularRecipesView(View):
         recipes = Recipe.objects.annotate(save_count=Count('collections')).order_by('-save_count')[:10]
         return render(request, 'admin/popular_recipes.html', {'recipes': recipes})
 
+@method_decorator(staff_member_required, name='dispatch')
+class LeaderboardView(View):
+    def get(self, request):
+        category, _ = facets.clean(request.GET.get('category'), None)
+        page_obj = Paginator(leaderboard.entries(category), 50).get_page(request.GET.get('page'))
+        context = dict(
+            admin_site.each_context(request),
+            title='Top Rated Recipes',
+            page_obj=page_obj,
+            category=category,
+            categories=Recipe.CATEGORY_CHOICES,
+            state=LeaderboardState.objects.first(),
+            min_votes=leaderboard.min_votes(),
+        )
+        return render(request, 'admin/leaderboard.html', context)
+
 @method_decorator(staff_member_required, name='dispatch')
 class UserActivityView(View):
     def get(self, request):
@@ -219,6 +237,7 @@ class MyAdminSite(admin.AdminSite):
         urls = super().get_urls()
         custom_urls = [
             path('popular_recipes/', self.admin_view(PopularRecipesView.as_view()), name='popular_recipes'),
+            path('leaderboard/', self.admin_view(LeaderboardView.as_view()), name='leaderboard'),
             path('user_activity/', self.admin_view(UserActivityView.as_view()), name='user_activity'),
         ]
         return custom_urls + urls
@@ -0,0 +1,288 @@
+# autocomplete.py
+"""
+In-memory prefix index for search-box autocomplete.
+
+Recipe titles (from every word start, so "par" finds "Aloo Paratha") and
+normalized ingredient names are kept in a sorted array; a lookup is two
+binary searches plus a top-k pick, and results for a prefix are memoized
+until the next change. Prefixes of up to ``SHORT_PREFIX`` characters match
+most of the array, so their top completions are kept precomputed instead.
+
+The index is built when a server process starts (``warm``, called from
+wsgi.py and asgi.py) and never on a request. Recipe signals update it in
+place in the saving process and, once the write commits, bump a version in
+the shared cache that the saving process adopts; other processes notice the
+new version (or an index older than ``AUTOCOMPLETE_REFRESH_SECONDS``) and
+rebuild in a background thread while they keep answering from the old index.
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+
+from . import caching
+from .ingredients import parse_ingredients
+from .models import Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+RECIPE = "recipe"
+INGREDIENT = "ingredient"
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+CACHE_SIZE = 10000  # memoized prefixes kept before the cache is reset
+SHORT_PREFIX = 2  # prefixes up to this length are answered from precomputed lists
+VERSION_CHECK_SECONDS = 1  # how often a lookup may read the shared version
+
+
+def _title_keys(title):
+    """Return the lookup keys of a title: the lowercase title from each word start."""
+    lowered = " ".join(title.lower().split())
+    keys = [lowered]
+    keys.extend(lowered[i + 1:] for i, char in enumerate(lowered) if char == " ")
+    return keys
+
+
+def _keys(kind, text):
+    return _title_keys(text) if kind == RECIPE else [text]
+
+
+def _short_prefixes(key):
+    return {key[:length] for length in range(1, SHORT_PREFIX + 1)}
+
+
+def _rank(items, weights, limit):
+    """Pick the ``limit`` most used (kind, text) items, ties broken alphabetically."""
+    return heapq.nsmallest(limit, items, key=lambda item: (-weights[item], item[1].lower(), item[0]))
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index of (key, kind, text) entries weighted by recipe count.
+
+    Attributes:
+        built_at (float | None): ``time.monotonic()`` of the last build, None until built.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []  # sorted (key, kind, text) tuples
+        self._weights = Counter()  # (kind, text) -> number of recipes
+        self._titles = {}  # recipe id -> title
+        self._ingredients = {}  # recipe id -> ingredient names
+        self._top = {}  # short prefix -> its MAX_LIMIT best (kind, text) items
+        self._touched = set()  # short prefixes whose top list is out of date
+        self._cache = {}
+        self._version = None  # shared version the index was built from
+        self._checked_at = 0
+        self._refreshing = False
+        self.built_at = None
+
+    def _add(self, kind, text):
+        self._weights[(kind, text)] += 1
+        for key in _keys(kind, text):
+            self._touched.update(_short_prefixes(key))
+            if self._weights[(kind, text)] == 1:
+                bisect.insort(self._entries, (key, kind, text))
+
+    def _remove(self, kind, text):
+        self._weights[(kind, text)] -= 1
+        gone = self._weights[(kind, text)] <= 0
+        if gone:
+            del self._weights[(kind, text)]
+        for key in _keys(kind, text):
+            self._touched.update(_short_prefixes(key))
+            if gone:
+                i = bisect.bisect_left(self._entries, (key, kind, text))
+                if i < len(self._entries) and self._entries[i] == (key, kind, text):
+                    del self._entries[i]
+
+    def _matches(self, prefix):
+        """The distinct (kind, text) items with a key starting with ``prefix``."""
+        entries = self._entries
+        start = bisect.bisect_left(entries, (prefix,))
+        end = bisect.bisect_left(entries, (prefix + "\uffff",))
+        return {entries[i][1:] for i in range(start, end)}
+
+    def _update_top(self):
+        """Recompute the top lists of the short prefixes touched by in-place changes."""
+        for prefix in self._touched:
+            top = _rank(self._matches(prefix), self._weights, MAX_LIMIT)
+            if top:
+                self._top[prefix] = top
+            else:
+                self._top.pop(prefix, None)
+        self._touched = set()
+        self._cache = {}
+
+    def build(self):
+        """Load every recipe title and ingredient name from the database."""
+        version = caching.get_version(caching.AUTOCOMPLETE_VERSION_KEY)
+        titles = dict(Recipe.objects.values_list("id", "title").iterator())
+        ingredients = {}
+        for recipe_id, name in RecipeIngredient.objects.values_list(
+            "recipe_id", "ingredient__name"
+        ).iterator():
+            ingredients.setdefault(recipe_id, set()).add(name)
+
+        weights = Counter((RECIPE, title) for title in titles.values())
+        for names in ingredients.values():
+            weights.update((INGREDIENT, name) for name in names)
+        entries = sorted((key, kind, text) for kind, text in weights for key in _keys(kind, text))
+        candidates = defaultdict(set)
+        for key, kind, text in entries:
+            for prefix in _short_prefixes(key):
+                candidates[prefix].add((kind, text))
+        top = {prefix: _rank(items, weights, MAX_LIMIT) for prefix, items in candidates.items()}
+
+        with self._lock:
+            self._entries = entries
+            self._weights = weights
+            self._titles = titles
+            self._ingredients = ingredients
+            self._top = top
+            self._touched = set()
+            self._cache = {}
+            self._version = version
+            self.built_at = time.monotonic()
+
+    def warm(self):
+        """Build the index before the process serves requests; on failure, leave it to ``refresh``."""
+        try:
+            self.build()
+        except DatabaseError:
+            logger.warning("Could not build the autocomplete index at startup", exc_info=True)
+
+    def _rebuild(self):
+        try:
+            self.build()
+        except DatabaseError:
+            logger.warning("Could not rebuild the autocomplete index", exc_info=True)
+        finally:
+            self._refreshing = False
+            connections.close_all()  # this thread's connections only
+
+    def refresh(self):
+        """Rebuild the index in a background thread unless a rebuild is already running."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._rebuild, name="autocomplete-refresh", daemon=True).start()
+
+    def _is_stale(self):
+        """Whether another process has changed recipes or the index has outlived the refresh interval."""
+        now = time.monotonic()
+        if now - self.built_at > getattr(settings, "AUTOCOMPLETE_REFRESH_SECONDS", 300):
+            return True
+        if now - self._checked_at < VERSION_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        return caching.get_version(caching.AUTOCOMPLETE_VERSION_KEY) != self._version
+
+    def _announce_change(self):
+        """
+        Make other processes' indexes rebuild once the current write is committed.
+
+        This process has already applied the change in place, so it adopts the
+        new version, unless another process changed recipes in between.
+        """
+        def bump():
+            seen = self._version
+            version = caching.bump_version(caching.AUTOCOMPLETE_VERSION_KEY)
+            if seen is not None and version == seen + 1:
+                self._version = version
+
+        transaction.on_commit(bump)
+
+    def update_recipe(self, recipe):
+        """
+        Replace a recipe's title and ingredient entries after it was saved.
+
+        Args:
+            recipe (Recipe): The saved recipe.
+        """
+        self._announce_change()
+        if self.built_at is None:
+            return  # the next build reads it from the database
+        names = set(parse_ingredients(recipe.ingredients))
+        with self._lock:
+            old_title = self._titles.get(recipe.pk)
+            old_names = self._ingredients.get(recipe.pk, set())
+            if old_title != recipe.title:
+                if old_title is not None:
+                    self._remove(RECIPE, old_title)
+                self._add(RECIPE, recipe.title)
+            for name in old_names - names:
+                self._remove(INGREDIENT, name)
+            for name in names - old_names:
+                self._add(INGREDIENT, name)
+            self._titles[recipe.pk] = recipe.title
+            self._ingredients[recipe.pk] = names
+            self._update_top()
+
+    def remove_recipe(self, recipe_id):
+        """
+        Drop a deleted recipe's entries.
+
+        Args:
+            recipe_id (int): Primary key of the deleted recipe.
+        """
+        self._announce_change()
+        if self.built_at is None:
+            return
+        with self._lock:
+            title = self._titles.pop(recipe_id, None)
+            if title is not None:
+                self._remove(RECIPE, title)
+            for name in self._ingredients.pop(recipe_id, set()):
+                self._remove(INGREDIENT, name)
+            self._update_top()
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        Return the most used titles and ingredients starting with a prefix.
+
+        Never queries the database: an index that is not built yet answers
+        nothing, and a stale one keeps answering while it is rebuilt.
+
+        Args:
+            prefix (str): What the user has typed so far.
+            limit (int): Maximum number of completions (at most ``MAX_LIMIT``).
+
+        Returns:
+            list[dict]: ``{"text": ..., "type": "recipe" | "ingredient"}`` items, most common first.
+        """
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        if self.built_at is None or self._is_stale():
+            self.refresh()
+            if self.built_at is None:
+                return []
+        limit = min(limit, MAX_LIMIT)
+        cache_key = (prefix, limit)
+        results = self._cache.get(cache_key)
+        if results is not None:
+            return results
+
+        with self._lock:
+            if len(prefix) <= SHORT_PREFIX:
+                top = self._top.get(prefix, [])[:limit]
+            else:
+                top = _rank(self._matches(prefix), self._weights, limit)
+            results = [{"text": text, "type": kind} for kind, text in top]
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache = {}
+            self._cache[cache_key] = results
+        return results
+
+
+index = PrefixIndex()
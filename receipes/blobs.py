@@ -0,0 +1,141 @@
+# blobs.py
+"""
+Reference counting and garbage collection of stored recipe images.
+
+Image files are content-addressed and shared between recipes (see
+storage.py), so replacing or deleting a recipe's image must not delete the
+file. Instead ``ImageBlob.ref_count`` follows how many recipes point at each
+file (maintained by Recipe signals), and ``collect`` deletes files, with their
+responsive variants, once nothing has used them for a grace period. The grace
+period covers uploads whose recipe has not been saved yet.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import images
+from .models import ImageBlob, Recipe
+from .storage import is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+GRACE_PERIOD = timedelta(hours=1)
+
+
+def image_storage():
+    return Recipe._meta.get_field("image").storage
+
+
+def acquire(name):
+    """
+    Count one more recipe using a stored file.
+
+    Args:
+        name (str): Stored file name; ignored when empty.
+    """
+    if not name:
+        return
+    changes = {"ref_count": F("ref_count") + 1, "unreferenced_since": None}
+    if ImageBlob.objects.filter(name=name).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, ref_count=1)
+    except IntegrityError:  # created concurrently
+        ImageBlob.objects.filter(name=name).update(**changes)
+
+
+def release(name):
+    """
+    Count one recipe less using a stored file, starting its grace period at zero.
+
+    Args:
+        name (str): Stored file name; ignored when empty.
+    """
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name).update(ref_count=F("ref_count") - 1)
+    ImageBlob.objects.filter(name=name, ref_count__lte=0, unreferenced_since=None).update(
+        unreferenced_since=timezone.now()
+    )
+
+
+@transaction.atomic
+def recount():
+    """
+    Rebuild every reference count from the recipe table.
+
+    Returns:
+        int: The number of files referenced by at least one recipe.
+    """
+    counts = dict(
+        Recipe.objects.exclude(image="").values("image").annotate(n=Count("pk")).values_list("image", "n")
+    )
+    known = set(ImageBlob.objects.values_list("name", flat=True))
+    ImageBlob.objects.bulk_create([ImageBlob(name=name) for name in counts.keys() - known])
+    now = timezone.now()
+    blobs = list(ImageBlob.objects.all())
+    for blob in blobs:
+        blob.ref_count = counts.get(blob.name, 0)
+        if blob.ref_count:
+            blob.unreferenced_since = None
+        elif blob.unreferenced_since is None:
+            blob.unreferenced_since = now
+    ImageBlob.objects.bulk_update(blobs, ["ref_count", "unreferenced_since"], batch_size=500)
+    return len(counts)
+
+
+def _delete_file(name, storage):
+    if storage.exists(name):
+        storage.delete(name)
+    images.delete_source_variants(name)
+
+
+def _orphan_files(storage, cutoff, directory="recipes"):
+    """Content-addressed files older than ``cutoff`` that have no ImageBlob row."""
+    known = set(ImageBlob.objects.values_list("name", flat=True))
+    try:
+        subdirectories, _ = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for subdirectory in subdirectories:
+        for filename in storage.listdir(f"{directory}/{subdirectory}")[1]:
+            name = f"{directory}/{subdirectory}/{filename}"
+            if is_content_addressed(name) and name not in known and storage.get_modified_time(name) < cutoff:
+                yield name
+
+
+def collect(grace=GRACE_PERIOD):
+    """
+    Delete stored images that no recipe has used for longer than ``grace``.
+
+    Args:
+        grace (timedelta): How long a file must have been unreferenced.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    storage = image_storage()
+    cutoff = timezone.now() - grace
+    deleted = 0
+    for blob in ImageBlob.objects.filter(ref_count__lte=0, unreferenced_since__lt=cutoff):
+        # Drop the row first, and only if it is still unreferenced, so a concurrent acquire wins.
+        if not ImageBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+            continue
+        in_use = Recipe.objects.filter(image=blob.name).count()
+        if in_use:  # count drifted; keep the file
+            ImageBlob.objects.create(name=blob.name, ref_count=in_use)
+            continue
+        _delete_file(blob.name, storage)
+        deleted += 1
+    for name in list(_orphan_files(storage, cutoff)):
+        if not Recipe.objects.filter(image=name).exists():
+            _delete_file(name, storage)
+            deleted += 1
+    if deleted:
+        logger.info("Deleted %d unreferenced recipe images", deleted)
+    return deleted
@@ -0,0 +1,194 @@
+# caching.py
+"""
+Versioned caching for the recipe list and recipe pages.
+
+Three things are cached:
+
+* the result of a list request (recipe ids on the page, pagination links and
+  facet counts) per normalized set of filters,
+* the rendered, user-independent body of each recipe card, and
+* the shared part of each recipe detail page, keyed by ``Recipe.updated_at``
+  (see ``views.recipe_page``).
+
+Keys embed version numbers that Recipe signals bump on save/delete (one per
+recipe plus one for the whole list), so a stale entry is never read again and
+simply expires. Versions start from the current time in milliseconds so a
+version key lost to eviction cannot come back at a number already used.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Recipe
+from .search import RankedRecipes
+
+LIST_VERSION_KEY = "recipe_list_version"
+AUTOCOMPLETE_VERSION_KEY = "autocomplete_version"  # bumped when recipes change (see autocomplete.py)
+LIST_TIMEOUT = 60 * 10  # seconds a list page stays cached
+CARD_TIMEOUT = 60 * 60 * 24  # seconds a rendered card stays cached
+PAGE_TIMEOUT = 60 * 60  # seconds the shared part of a recipe page stays cached
+UNREAD_TIMEOUT = 60 * 60  # seconds a user's unread notification count stays cached
+CARD_TEMPLATE = "recipe_card.html"
+
+
+def _initial_version():
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """
+    Return the current value of a version counter, creating it if needed.
+
+    Args:
+        key (str): Cache key of the counter.
+
+    Returns:
+        int: The version.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Increment a version counter so every key built from it changes.
+
+    Args:
+        key (str): Cache key of the counter.
+
+    Returns:
+        int: The new version.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:  # counter evicted or never created
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def recipe_version_key(pk):
+    return f"recipe_version:{pk}"
+
+
+def recipe_page_key(pk, updated_at):
+    """Cache key of the shared part of a recipe page; ``updated_at`` acts as its version."""
+    return f"recipe_page:{pk}:{updated_at.timestamp()}"
+
+
+def collections_version_key(user_id):
+    return f"collections_version:{user_id}"
+
+
+def unread_count_key(user_id):
+    return f"unread_notifications:{user_id}"
+
+
+def invalidate_recipe(pk):
+    """
+    Invalidate the cached card of a recipe and every cached list page.
+
+    Args:
+        pk (int): Primary key of the saved or deleted recipe.
+    """
+    bump_version(recipe_version_key(pk))
+    bump_version(LIST_VERSION_KEY)
+
+
+# Parameters matched case- and whitespace-insensitively; every other one
+# (cursor, page, facet slugs) selects a different page when it differs at all.
+FREE_TEXT_PARAMS = ("search_query", "pantry")
+
+
+def normalize_param(value):
+    """Lowercase and collapse whitespace so equivalent queries share a cache entry."""
+    return " ".join(value.lower().split())
+
+
+def list_cache_key(params):
+    """
+    Build the cache key of a list page.
+
+    Only ``FREE_TEXT_PARAMS`` are normalized; the rest go into the key unchanged.
+
+    Args:
+        params (dict): The request parameters that select the page.
+
+    Returns:
+        str: A key tied to the current list version.
+    """
+    normalized = sorted(
+        (name, normalize_param(value) if name in FREE_TEXT_PARAMS else value)
+        for name, value in params.items()
+        if value
+    )
+    digest = hashlib.md5(repr(normalized).encode()).hexdigest()
+    return f"recipe_list:{get_version(LIST_VERSION_KEY)}:{digest}"
+
+
+def recipe_cards(ids, recipes=None):
+    """
+    Return the rendered card bodies of the given recipes, rendering only cache misses.
+
+    Args:
+        ids (list[int]): Recipe ids in display order.
+        recipes (Iterable[Recipe], optional): Already loaded recipes to render misses from.
+
+    Returns:
+        list[dict]: ``{"pk": ..., "html": ...}`` per recipe that still exists, in order.
+    """
+    version_keys = {pk: recipe_version_key(pk) for pk in ids}
+    versions = cache.get_many(version_keys.values())
+    for pk, key in version_keys.items():
+        if key not in versions:
+            versions[key] = get_version(key)
+    card_keys = {pk: f"recipe_card:{pk}:{versions[version_keys[pk]]}" for pk in ids}
+    cards = cache.get_many(card_keys.values())
+
+    missing = [pk for pk in ids if card_keys[pk] not in cards]
+    if missing:
+        loaded = {recipe.pk: recipe for recipe in recipes or ()}
+        if set(missing) - loaded.keys():
+            loaded.update(Recipe.objects.in_bulk(set(missing) - loaded.keys()))
+        rendered = {
+            card_keys[pk]: render_to_string(CARD_TEMPLATE, {"recipe": loaded[pk]})
+            for pk in missing
+            if pk in loaded
+        }
+        cache.set_many(rendered, CARD_TIMEOUT)
+        cards.update(rendered)
+
+    return [{"pk": pk, "html": mark_safe(cards[card_keys[pk]])} for pk in ids if card_keys[pk] in cards]
+
+
+class CachedPage:
+    """
+    Stand-in for a paginator page rebuilt from a cached list entry.
+
+    Its ``object_list`` loads the recipes lazily, only if something asks for them.
+    """
+
+    def __init__(self, listing):
+        self.object_list = RankedRecipes([(pk, 0) for pk in listing["ids"]])
+        self.number = listing["page_number"]
+        self._has_previous = bool(listing["previous_page_query"])
+        self._has_next = bool(listing["next_page_query"])
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
@@ -0,0 +1,95 @@
+# conditional.py
+"""
+Conditional GET support (ETag / Last-Modified) for the recipe pages.
+
+The validators are computed before the view runs (see
+``django.views.decorators.http.condition``) so a browser revalidating a page
+it already has gets a 304 after a single primary-key lookup on the recipe, or
+for the home list only cache reads, without running the page's queries.
+
+Pages contain per-user parts (forms, owner-only buttons, the CSRF token, the
+unread notification badge), so every ETag includes the user, their session
+key (a new login rotates both the session and the CSRF secret) and their
+cached unread count, and responses are marked ``private``.
+"""
+
+import hashlib
+
+from django.utils import timezone
+
+from . import caching
+from .models import Recipe
+from .notifications import unread_count
+
+
+def touch_recipe(pk):
+    """
+    Mark a recipe page as changed without loading the recipe.
+
+    Args:
+        pk (int): Primary key of the recipe whose page content changed.
+    """
+    Recipe.objects.filter(pk=pk).update(updated_at=timezone.now())
+
+
+def _etag(request, *parts):
+    unread = unread_count(request.user.pk) if request.user.is_authenticated else 0
+    raw = ":".join(str(part) for part in (*parts, request.user.pk, request.session.session_key, unread))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def recipe_last_modified(request, pk):
+    """
+    Return when a recipe page last changed, fetched at most once per request.
+
+    Args:
+        request (HttpRequest): The request.
+        pk (int): Primary key of the recipe.
+
+    Returns:
+        datetime | None: ``Recipe.updated_at``, or None if the recipe does not exist.
+    """
+    cached = getattr(request, "_recipe_updated_at", {})
+    if pk not in cached:
+        cached[pk] = Recipe.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+        request._recipe_updated_at = cached
+    return cached[pk]
+
+
+def recipe_etag(request, pk):
+    """
+    ETag of a recipe detail page for the requesting user.
+
+    Args:
+        request (HttpRequest): The request.
+        pk (int): Primary key of the recipe.
+
+    Returns:
+        str | None: The ETag, or None if the recipe does not exist.
+    """
+    updated_at = recipe_last_modified(request, pk)
+    if updated_at is None:
+        return None
+    return _etag(request, "recipe", pk, updated_at.isoformat())
+
+
+def home_etag(request, *args, **kwargs):
+    """
+    ETag of a home list page for the requesting user.
+
+    Built from the list cache version (bumped on every recipe save/delete), the
+    user's collections version and the query string, so it costs cache reads only.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        str: The ETag.
+    """
+    query = sorted(request.GET.lists())
+    collections = (
+        caching.get_version(caching.collections_version_key(request.user.pk))
+        if request.user.is_authenticated
+        else 0
+    )
+    return _etag(request, "home", caching.get_version(caching.LIST_VERSION_KEY), collections, query)
@@ -0,0 +1,43 @@
+# consumers.py
+"""
+WebSocket push of new notifications (Django Channels).
+
+Each logged-in browser tab connects to ``/ws/notifications/`` and joins its
+user's group (``notifications.user_group``). ``notifications.deliver`` sends every new
+notification to that group once it is written, so pages learn about new
+events without polling the inbox. On connect the consumer also sends the
+current unread count.
+
+Messages sent to the client are JSON objects:
+
+    {"type": "unread_count", "unread_count": 3}
+    {"type": "notification", "id": 42, "message": "...", "sender": "alice",
+     "created_at": "2024-06-01T12:00:00+00:00"}
+"""
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .notifications import unread_count, user_group
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Forwards a user's new notifications to their open WebSocket."""
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = user_group(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        count = await database_sync_to_async(unread_count)(user.pk)
+        await self.send_json({"type": "unread_count", "unread_count": count})
+
+    async def disconnect(self, code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification_message(self, event):
+        """Handle ``{"type": "notification.message", "notification": {...}}`` group messages."""
+        await self.send_json({"type": "notification", **event["notification"]})
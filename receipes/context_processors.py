@@ -0,0 +1,18 @@
+# context_processors.py
+"""Template context shared by every page."""
+
+from functools import partial
+
+from .notifications import unread_count
+
+
+def unread_notifications(request):
+    """
+    Expose the user's unread notification count as ``unread_notification_count``.
+
+    The value is a callable, so the (cached) count is only looked up by
+    templates that display it.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {"unread_notification_count": partial(unread_count, request.user.pk)}
@@ -0,0 +1,192 @@
+# facets.py
+"""
+Category and cooking-time facets for the recipe list.
+
+Counts per (category, cooking-time bucket) live in ``RecipeFacetCount`` and
+are adjusted by Recipe signals, so rendering "Dinner (1,204)" reads a
+handful of rows instead of running ``GROUP BY`` over the recipe table.
+Filtering uses the composite ``(category, cooking_time)`` index.
+
+Search results are faceted over their best ``MAX_RANKED`` matches only, so
+the lookup stays one bounded ``IN`` query however many recipes match.
+"""
+
+from django.db.models import F
+
+from .models import Recipe, RecipeFacetCount
+
+# (slug, label, lower bound inclusive, upper bound exclusive) in minutes.
+TIME_BUCKETS = [
+    ("quick", "Under 15 minutes", None, 15),
+    ("short", "15 to 30 minutes", 15, 30),
+    ("medium", "30 to 60 minutes", 30, 60),
+    ("long", "Over an hour", 60, None),
+]
+
+CATEGORY_LABELS = dict(Recipe.CATEGORY_CHOICES)
+TIME_LABELS = {slug: label for slug, label, _, _ in TIME_BUCKETS}
+
+MAX_RANKED = 500  # ranked results kept for filtering and facet counts
+
+
+def time_bucket(minutes):
+    """
+    Return the slug of the cooking-time bucket containing a duration.
+
+    Args:
+        minutes (int): Cooking time in minutes.
+
+    Returns:
+        str: The bucket slug.
+    """
+    minutes = int(minutes)
+    for slug, _, lower, upper in TIME_BUCKETS:
+        if (lower is None or minutes >= lower) and (upper is None or minutes < upper):
+            return slug
+    return TIME_BUCKETS[-1][0]
+
+
+def adjust_count(category, minutes, delta):
+    """
+    Add ``delta`` to the stored count of a recipe's facet cell.
+
+    Args:
+        category (str): The recipe category.
+        minutes (int): The recipe cooking time.
+        delta (int): +1 when a recipe enters the cell, -1 when it leaves.
+    """
+    bucket = time_bucket(minutes)
+    RecipeFacetCount.objects.get_or_create(category=category, time_bucket=bucket)
+    RecipeFacetCount.objects.filter(category=category, time_bucket=bucket).update(
+        count=F("count") + delta
+    )
+
+
+def rebuild_counts():
+    """
+    Recompute every facet count from the recipe table.
+
+    Returns:
+        int: The number of recipes counted.
+    """
+    counts = {}
+    for category, minutes in Recipe.objects.values_list("category", "cooking_time").iterator():
+        key = (category, time_bucket(minutes))
+        counts[key] = counts.get(key, 0) + 1
+    RecipeFacetCount.objects.all().delete()
+    RecipeFacetCount.objects.bulk_create(
+        [
+            RecipeFacetCount(category=category, time_bucket=bucket, count=count)
+            for (category, bucket), count in counts.items()
+        ]
+    )
+    return sum(counts.values())
+
+
+def clean(category, bucket):
+    """Drop unknown facet values so they act as "no filter"."""
+    return (
+        category if category in CATEGORY_LABELS else None,
+        bucket if bucket in TIME_LABELS else None,
+    )
+
+
+def filter_queryset(queryset, category=None, bucket=None):
+    """
+    Restrict a recipe queryset to the selected facets.
+
+    Args:
+        queryset (QuerySet): Recipes to filter.
+        category (str, optional): Selected category.
+        bucket (str, optional): Selected cooking-time bucket slug.
+
+    Returns:
+        QuerySet: The filtered recipes.
+    """
+    if category:
+        queryset = queryset.filter(category=category)
+    if bucket:
+        _, _, lower, upper = next(b for b in TIME_BUCKETS if b[0] == bucket)
+        if lower is not None:
+            queryset = queryset.filter(cooking_time__gte=lower)
+        if upper is not None:
+            queryset = queryset.filter(cooking_time__lt=upper)
+    return queryset
+
+
+def _facets(cells, category, bucket):
+    """Turn {(category, bucket): count} cells into the per-facet option lists."""
+    category_counts = dict.fromkeys(CATEGORY_LABELS, 0)
+    time_counts = dict.fromkeys(TIME_LABELS, 0)
+    for (cell_category, cell_bucket), count in cells.items():
+        # Each facet is counted under the other facet's selection only.
+        if bucket is None or cell_bucket == bucket:
+            category_counts[cell_category] = category_counts.get(cell_category, 0) + count
+        if category is None or cell_category == category:
+            time_counts[cell_bucket] = time_counts.get(cell_bucket, 0) + count
+    return {
+        "category": [
+            {"value": value, "label": CATEGORY_LABELS.get(value, value), "count": count, "selected": value == category}
+            for value, count in category_counts.items()
+            if value in CATEGORY_LABELS
+        ],
+        "time": [
+            {"value": value, "label": TIME_LABELS[value], "count": count, "selected": value == bucket}
+            for value, count in time_counts.items()
+            if value in TIME_LABELS
+        ],
+    }
+
+
+def facet_counts(category=None, bucket=None):
+    """
+    Facet options with counts for the whole catalogue, read from the count table.
+
+    Args:
+        category (str, optional): Selected category.
+        bucket (str, optional): Selected cooking-time bucket slug.
+
+    Returns:
+        dict: ``{"category": [...], "time": [...]}`` lists of option dicts
+        with ``value``, ``label``, ``count`` and ``selected`` keys.
+    """
+    cells = {
+        (row.category, row.time_bucket): row.count
+        for row in RecipeFacetCount.objects.filter(count__gt=0)
+    }
+    return _facets(cells, category, bucket)
+
+
+def filter_ranked(ranked, category=None, bucket=None):
+    """
+    Apply facets to ranked search results and count facets over those results.
+
+    Only the first ``MAX_RANKED`` results are kept; nobody pages past them.
+
+    Args:
+        ranked (list[tuple[int, float]]): (recipe id, score) pairs, best first.
+        category (str, optional): Selected category.
+        bucket (str, optional): Selected cooking-time bucket slug.
+
+    Returns:
+        tuple[list, dict]: The ranked pairs that match the facets, and the
+        facet options counted over the kept results (see ``facet_counts``).
+    """
+    ranked = ranked[:MAX_RANKED]
+    values = {}
+    if ranked:
+        rows = Recipe.objects.filter(pk__in=[recipe_id for recipe_id, _ in ranked]).values_list(
+            "pk", "category", "cooking_time"
+        )
+        values = {pk: (row_category, time_bucket(minutes)) for pk, row_category, minutes in rows}
+    cells = {}
+    for key in values.values():
+        cells[key] = cells.get(key, 0) + 1
+    matching = [
+        (recipe_id, score)
+        for recipe_id, score in ranked
+        if recipe_id in values
+        and (category is None or values[recipe_id][0] == category)
+        and (bucket is None or values[recipe_id][1] == bucket)
+    ]
+    return matching, _facets(cells, category, bucket)
@@ -1,5 +1,7 @@
 # users/forms.py
 from django import forms
+from django.conf import settings
+from django.core.validators import FileExtensionValidator, get_available_image_extensions
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Recipe,Comment,Rating,Profile,RecipeCollection
@@ -14,13 +16,32 @@ class CustomUserCreationForm(UserCreationForm):
 class ProfileForm(forms.ModelForm):
     class Meta:
         model = Profile
-        fields = ['bio']
+        fields = ['bio', 'email_frequency']
 
 class RecipeForm(forms.ModelForm):
+    # A plain file field: the upload is only checked by extension here and is
+    # decoded and verified by a background task (see images.process), so the
+    # web worker never runs Pillow on it.
+    image = forms.FileField(
+        required=False,
+        validators=[FileExtensionValidator(get_available_image_extensions())],
+        widget=forms.ClearableFileInput(attrs={'accept': 'image/*'}),
+    )
+
     class Meta:
         model = Recipe
         fields=['title','ingredients','instructions','category','cooking_time','image']
 
+    def __init__(self, *args, rejected_uploads=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejected_uploads = rejected_uploads  # fields skipped by uploads.SizeLimitedUploadHandler
+
+    def clean_image(self):
+        if 'image' in self.rejected_uploads:
+            limit = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)
+            raise forms.ValidationError(f'Images must be at most {limit} MB.')
+        return self.cleaned_data['image']
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model =Comment
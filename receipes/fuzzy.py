@@ -0,0 +1,153 @@
+# fuzzy.py
+"""
+Typo-tolerant title search.
+
+Each recipe title is broken into character trigrams (words padded like
+PostgreSQL's pg_trgm: "  egg " -> "  e", " eg", "egg", "gg ") stored in
+``TitleTrigram``. A query gathers candidates by counting shared trigrams
+through the trigram index, then re-ranks the best candidates by edit
+distance, so "paratah" finds "Aloo Paratha" without scanning every title.
+"""
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Recipe, TitleTrigram
+from .search import TOKEN_RE
+
+MAX_CANDIDATES = 200  # candidates re-ranked by edit distance
+MIN_SIMILARITY = 0.3  # minimum share of the query's trigrams found in a candidate title
+
+
+def trigrams(text):
+    """
+    Return the set of padded character trigrams of a text.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        set[str]: The trigrams.
+    """
+    result = set()
+    for word in TOKEN_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def edit_distance(a, b):
+    """
+    Optimal string alignment distance: insertions, deletions, substitutions
+    and transpositions of adjacent characters each cost 1.
+
+    Args:
+        a (str): First string.
+        b (str): Second string.
+
+    Returns:
+        int: The distance.
+    """
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def title_distance(query, title):
+    """
+    Edit distance between a query and the closest run of words in a title.
+
+    Args:
+        query (str): The search text.
+        title (str): A recipe title.
+
+    Returns:
+        int: The smallest distance to the whole title or any run of as many words as the query.
+    """
+    query_words = TOKEN_RE.findall(query.lower())
+    title_words = TOKEN_RE.findall(title.lower())
+    query_text = " ".join(query_words)
+    width = max(len(query_words), 1)
+    windows = [" ".join(title_words)]
+    windows.extend(" ".join(title_words[i:i + width]) for i in range(len(title_words) - width + 1))
+    return min(edit_distance(query_text, window) for window in windows)
+
+
+@transaction.atomic
+def index_title(recipe):
+    """
+    Bring a recipe's stored trigrams in line with its title.
+
+    Args:
+        recipe (Recipe): A saved recipe.
+    """
+    wanted = trigrams(recipe.title)
+    current = set(TitleTrigram.objects.filter(recipe=recipe).values_list("trigram", flat=True))
+    if current - wanted:
+        TitleTrigram.objects.filter(recipe=recipe, trigram__in=current - wanted).delete()
+    if wanted - current:
+        TitleTrigram.objects.bulk_create(
+            [TitleTrigram(recipe=recipe, trigram=trigram) for trigram in wanted - current]
+        )
+
+
+@transaction.atomic
+def rebuild_index():
+    """
+    Rebuild the trigram index of every title.
+
+    Returns:
+        int: The number of recipes indexed.
+    """
+    TitleTrigram.objects.all().delete()
+    count = 0
+    for recipe in Recipe.objects.only("pk", "title").iterator():
+        index_title(recipe)
+        count += 1
+    return count
+
+
+def search(query, limit=None):
+    """
+    Find recipes whose titles are close to a possibly misspelled query.
+
+    Args:
+        query (str): The search text.
+        limit (int, optional): Maximum number of results to return.
+
+    Returns:
+        list[tuple[int, float]]: (recipe id, score) pairs, closest title first.
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return []
+
+    candidates = (
+        TitleTrigram.objects.filter(trigram__in=query_trigrams)
+        .values("recipe_id")
+        .annotate(shared=Count("id"))
+        .order_by("-shared", "recipe_id")[:MAX_CANDIDATES]
+    )
+    shared = {row["recipe_id"]: row["shared"] for row in candidates}
+    titles = dict(Recipe.objects.filter(pk__in=shared).values_list("pk", "title"))
+
+    max_distance = max(1, len(query.strip()) // 3)
+    results = []
+    for recipe_id, title in titles.items():
+        similarity = shared[recipe_id] / len(query_trigrams)
+        if similarity < MIN_SIMILARITY:
+            continue
+        distance = title_distance(query, title)
+        if distance <= max_distance:
+            results.append((recipe_id, distance, similarity))
+
+    results.sort(key=lambda row: (row[1], -row[2], row[0]))
+    ranked = [(recipe_id, 1 / (1 + distance)) for recipe_id, distance, _ in results]
+    return ranked[:limit] if limit else ranked
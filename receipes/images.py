@@ -0,0 +1,305 @@
+# images.py
+"""
+Background processing of recipe images.
+
+Uploads are saved unverified with ``Recipe.image_status`` "processing"; a
+background task (``tasks.process_recipe_image``) then runs ``process``:
+
+* ``normalize`` decodes the file (rejecting anything Pillow cannot read),
+  applies the EXIF orientation, strips metadata and scales oversized originals
+  down to ``RECIPE_IMAGE_MAX_DIMENSION``, storing the result as a new file;
+* ``generate_variants`` writes downscaled JPEG and WebP copies at a few widths
+  and records them in ``Recipe.image_variants``, marking the image ready:
+
+    {"source": "recipes/3f/3fa9...c1.jpg", "width": 2400,
+     "variants": [{"width": 320, "jpeg": "recipes/variants/3fa9...c1-320.jpg",
+                   "webp": "recipes/variants/3fa9...c1-320.webp"}, ...]}
+
+Templates build ``srcset`` attributes from it (see ``Recipe.image_srcset``).
+The same pass stores the image's dimensions, dominant colour and a tiny
+base64 preview (``Recipe.image_width`` ... ``image_lqip``) so pages can render
+lazy-loaded images with a fixed box and an inline placeholder.
+The record names its source file, so variants left over from a replaced image
+are ignored until the task has caught up.
+
+Animated uploads (typically GIFs) are not cut into still variants; they get
+one animated WebP, usually several times smaller than the GIF, and a still
+poster frame:
+
+    {"source": ..., "width": 480, "variants": [],
+     "animated": {"webp": "recipes/variants/...-anim.webp",
+                  "poster": "recipes/variants/...-poster.jpg"}}
+
+Variants are named after their source file, which never changes once stored
+(see storage.py), so recipes sharing an image share its variants, existing
+variants are reused as-is, and they are deleted together with the source by
+``blobs.collect``.
+"""
+
+import base64
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, ImageSequence
+
+from . import blobs, caching
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = "recipes/variants"
+VARIANT_WIDTHS = (320, 640, 1024)
+VARIANT_FORMATS = (("jpeg", "JPEG", "jpg", 82), ("webp", "WEBP", "webp", 78))  # key, Pillow format, extension, quality
+ANIMATED_MAX_WIDTH = 800
+NORMALIZED_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}  # other formats become JPEG or PNG
+ANIMATED_WEBP_QUALITY = 70
+LQIP_WIDTH = 16
+LQIP_QUALITY = 50
+
+
+def variant_name(source, suffix, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f"{VARIANT_DIR}/{stem}-{suffix}.{extension}"
+
+
+def variant_names(source):
+    """Every name a variant of ``source`` can have."""
+    names = [
+        variant_name(source, width, extension)
+        for width in VARIANT_WIDTHS
+        for _, _, extension, _ in VARIANT_FORMATS
+    ]
+    return names + [variant_name(source, "anim", "webp"), variant_name(source, "poster", "jpg")]
+
+
+def _encode(image, format, quality):
+    buffer = io.BytesIO()
+    if format == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def _upright(image):
+    """Apply EXIF orientation and convert to a mode both JPEG and WebP encoders accept."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    return image
+
+
+def _resize(image, width):
+    return image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+
+def _dominant_color(image):
+    """The most common colour of a few-colour quantization, as "#rrggbb"."""
+    small = image.convert("RGB")
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=5)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _placeholder(image):
+    """
+    Summarize a still (upright) image for layout and placeholder rendering.
+
+    Args:
+        image (PIL.Image.Image): The image, or the first frame of an animation.
+
+    Returns:
+        dict: ``image_width``, ``image_height``, ``image_color`` and ``image_lqip`` model values.
+    """
+    preview = image.convert("RGB")
+    preview.thumbnail((LQIP_WIDTH, LQIP_WIDTH), Image.BOX)
+    buffer = io.BytesIO()
+    preview.save(buffer, "JPEG", quality=LQIP_QUALITY)
+    return {
+        "image_width": image.width,
+        "image_height": image.height,
+        "image_color": _dominant_color(image),
+        "image_lqip": "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def _encode_animation(image):
+    """Re-encode every frame of an animated image as one animated WebP, capped in width."""
+    width = min(image.width, ANIMATED_MAX_WIDTH)
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get("duration", image.info.get("duration", 100)))
+        frame = frame.convert("RGBA")
+        frames.append(_resize(frame, width) if width < image.width else frame)
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer, "WEBP", save_all=True, append_images=frames[1:], duration=durations,
+        loop=image.info.get("loop", 0), quality=ANIMATED_WEBP_QUALITY, method=4,
+    )
+    return buffer.getvalue()
+
+
+def _animated_variants(image, source, storage):
+    """Write the animated WebP and the poster frame of an animated image."""
+    names = {"webp": variant_name(source, "anim", "webp"), "poster": variant_name(source, "poster", "jpg")}
+    if not storage.exists(names["webp"]):
+        names["webp"] = storage.save(names["webp"], ContentFile(_encode_animation(image)))
+    if not storage.exists(names["poster"]):
+        image.seek(0)
+        poster = _upright(image.copy())
+        if poster.width > VARIANT_WIDTHS[-1]:
+            poster = _resize(poster, VARIANT_WIDTHS[-1])
+        names["poster"] = storage.save(names["poster"], ContentFile(_encode(poster, "JPEG", VARIANT_FORMATS[0][3])))
+    return names
+
+
+def delete_source_variants(source):
+    """
+    Remove every variant file of a source image.
+
+    Args:
+        source (str): Stored name of the source image.
+    """
+    for name in variant_names(source):
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+def _reject(recipe, name):
+    """Drop an upload that is not a readable image and mark the recipe's image as failed."""
+    updated = Recipe.objects.filter(pk=recipe.pk, image=name).update(
+        image="", image_status=Recipe.IMAGE_FAILED, image_variants={}, updated_at=timezone.now()
+    )
+    if updated:
+        blobs.release(name)
+        caching.invalidate_recipe(recipe.pk)
+
+
+def normalize(recipe):
+    """
+    Verify a recipe's uploaded image and rewrite it upright, without metadata and
+    no larger than ``RECIPE_IMAGE_MAX_DIMENSION``.
+
+    Animated images are only verified; their frames are re-encoded by
+    ``generate_variants``.
+
+    Args:
+        recipe (Recipe): The recipe; ``recipe.image`` is updated if the file is replaced.
+
+    Returns:
+        bool: False if the image was rejected or replaced meanwhile, so processing should stop.
+    """
+    name = recipe.image.name
+    try:
+        with recipe.image.open("rb") as f:
+            Image.open(f).verify()
+        with recipe.image.open("rb") as f:
+            image = Image.open(f)
+            if getattr(image, "is_animated", False):
+                return True
+            image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Rejected image %s of recipe %s: %s", name, recipe.pk, e)
+        _reject(recipe, name)
+        return False
+
+    max_dimension = settings.RECIPE_IMAGE_MAX_DIMENSION
+    format = image.format if image.format in NORMALIZED_FORMATS else None
+    if format and max(image.size) <= max_dimension and not image.getexif() and "exif" not in image.info:
+        return True  # already clean
+
+    icc_profile = image.info.get("icc_profile")
+    image = _upright(image)
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    if format is None:
+        format = "PNG" if image.mode == "RGBA" else "JPEG"
+    buffer = io.BytesIO()
+    options = {"icc_profile": icc_profile} if icc_profile else {}
+    if format == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=90, optimize=True, **options)
+    else:
+        image.save(buffer, format, **options)
+    new_name = recipe.image.storage.save(
+        f"{os.path.dirname(name)}/normalized{NORMALIZED_FORMATS[format]}", ContentFile(buffer.getvalue())
+    )
+
+    updated = Recipe.objects.filter(pk=recipe.pk, image=name).update(image=new_name, updated_at=timezone.now())
+    if not updated:  # replaced meanwhile; the new file is collected as an orphan
+        return False
+    blobs.acquire(new_name)
+    blobs.release(name)
+    recipe.image.name = new_name
+    return True
+
+
+def process(recipe):
+    """
+    Normalize a recipe's newly uploaded image and generate its variants.
+
+    Args:
+        recipe (Recipe): The recipe whose image was added, replaced or cleared.
+    """
+    if recipe.image and not normalize(recipe):
+        return
+    generate_variants(recipe)
+
+
+def generate_variants(recipe):
+    """
+    Write the width variants of a recipe's image, record them and the image's
+    placeholder on the recipe and mark the image ready.
+
+    Args:
+        recipe (Recipe): The recipe; its image may have been replaced or cleared.
+
+    Returns:
+        dict: The new ``image_variants`` record (empty when there is no image).
+    """
+    storage = default_storage  # variants have fixed names; the source storage would rename them by hash
+    record = {}
+    placeholder = {"image_width": 0, "image_height": 0, "image_color": "", "image_lqip": ""}
+
+    if recipe.image:
+        with recipe.image.open("rb") as f:
+            image = Image.open(f)
+            record = {"source": recipe.image.name, "width": image.width, "variants": []}
+            if getattr(image, "is_animated", False):  # frames are read from the open file
+                record["animated"] = _animated_variants(image, recipe.image.name, storage)
+                image.seek(0)
+                placeholder = _placeholder(_upright(image.copy()))
+                image = None  # no still width variants
+            else:
+                image.load()
+                image = _upright(image)
+                placeholder = _placeholder(image)
+        for width in VARIANT_WIDTHS if image else ():
+            if width >= image.width:
+                break
+            resized = None
+            variant = {"width": width}
+            for key, format, extension, quality in VARIANT_FORMATS:
+                name = variant_name(recipe.image.name, width, extension)
+                if not storage.exists(name):
+                    if resized is None:
+                        resized = _resize(image, width)
+                    name = storage.save(name, ContentFile(_encode(resized, format, quality)))
+                variant[key] = name
+            record["variants"].append(variant)
+
+    # Only record the variants if the image is still the one they were made from.
+    updated = Recipe.objects.filter(pk=recipe.pk, image=recipe.image.name or "").update(
+        image_variants=record, image_status=Recipe.IMAGE_READY, updated_at=timezone.now(), **placeholder
+    )
+    if not updated:
+        return recipe.image_variants
+    caching.invalidate_recipe(recipe.pk)
+    logger.info("Recorded %d image variants for recipe %s", len(record.get("variants", ())), recipe.pk)
+    return record
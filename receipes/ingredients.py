@@ -0,0 +1,119 @@
+# ingredients.py
+"""
+Normalized ingredients and "cook with what I have" lookups.
+
+``Recipe.ingredients`` is free text ("2 cups rice, eggs, salt to taste").
+It is parsed into ``Ingredient`` rows linked through ``RecipeIngredient`` so
+pantry lookups are an indexed join on ingredient ids instead of a substring
+scan over every recipe.
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Ingredient, Recipe, RecipeIngredient
+from .search import normalize_token
+
+SEPARATOR_RE = re.compile(r"[,;\n]+|\band\b")
+WORD_RE = re.compile(r"[a-z]+")
+
+# Words that describe amount or preparation rather than the ingredient itself.
+IGNORED_WORDS = frozenset(
+    """
+    a an of to taste some few handful pinch dash cup cups tbsp tsp tablespoon
+    tablespoons teaspoon teaspoons g gm gram grams kg ml l litre litres liter
+    liters oz ounce ounces lb lbs pound pounds piece pieces slice slices
+    chopped diced sliced minced grated crushed fresh finely roughly large small
+    medium optional
+    """.split()
+)
+
+
+def parse_ingredients(text):
+    """
+    Parse a free-text ingredient list into normalized ingredient names.
+
+    Quantities, units and preparation words are dropped and plurals are
+    reduced, so "2 cups Tomatoes, chopped" and "tomato" give the same name.
+
+    Args:
+        text (str): The contents of ``Recipe.ingredients``.
+
+    Returns:
+        list[str]: Distinct ingredient names in order of appearance.
+    """
+    max_length = Ingredient._meta.get_field("name").max_length
+    names = []
+    for item in SEPARATOR_RE.split((text or "").lower()):
+        item = re.sub(r"\(.*?\)", " ", item)
+        words = [
+            normalize_token(word) for word in WORD_RE.findall(item) if word not in IGNORED_WORDS
+        ]
+        name = " ".join(words)[:max_length].strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _ingredient_ids(names):
+    """Return name -> id for the given names, creating missing Ingredient rows."""
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+    return dict(Ingredient.objects.filter(name__in=names).values_list("name", "pk"))
+
+
+@transaction.atomic
+def sync_recipe_ingredients(recipe):
+    """
+    Bring a recipe's ``RecipeIngredient`` rows in line with its ingredient text.
+
+    Args:
+        recipe (Recipe): A saved recipe.
+    """
+    names = parse_ingredients(recipe.ingredients)
+    wanted = set(_ingredient_ids(names).values()) if names else set()
+    current = set(
+        RecipeIngredient.objects.filter(recipe=recipe).values_list("ingredient_id", flat=True)
+    )
+
+    if current - wanted:
+        RecipeIngredient.objects.filter(recipe=recipe, ingredient_id__in=current - wanted).delete()
+    if wanted - current:
+        RecipeIngredient.objects.bulk_create(
+            [RecipeIngredient(recipe=recipe, ingredient_id=pk) for pk in wanted - current]
+        )
+    if recipe.ingredient_count != len(wanted) or current != wanted:
+        Recipe.objects.filter(pk=recipe.pk).update(ingredient_count=len(wanted))
+        recipe.ingredient_count = len(wanted)
+
+
+def recipes_for_pantry(pantry, limit=None):
+    """
+    Rank recipes by how much of their ingredient list the pantry covers.
+
+    Args:
+        pantry (str | Iterable[str]): Ingredients on hand, either comma separated text or a list of names.
+        limit (int, optional): Maximum number of results to return.
+
+    Returns:
+        list[tuple[int, float]]: (recipe id, coverage) pairs where coverage is
+        the fraction of the recipe's ingredients in the pantry, best first.
+    """
+    if isinstance(pantry, str):
+        names = parse_ingredients(pantry)
+    else:
+        names = [name for item in pantry for name in parse_ingredients(item)]
+    ingredient_ids = Ingredient.objects.filter(name__in=names).values("pk")
+
+    matches = (
+        RecipeIngredient.objects.filter(ingredient_id__in=ingredient_ids)
+        .values("recipe_id", total=F("recipe__ingredient_count"))
+        .annotate(matched=Count("ingredient_id"))
+    )
+    ranked = sorted(
+        ((row["recipe_id"], row["matched"] / max(row["total"], 1), row["matched"]) for row in matches),
+        key=lambda row: (-row[1], -row[2], row[0]),
+    )
+    ranked = [(recipe_id, coverage) for recipe_id, coverage, _ in ranked]
+    return ranked[:limit] if limit else ranked
@@ -0,0 +1,134 @@
+# leaderboard.py
+"""
+Materialized top-rated leaderboard.
+
+A plain average lets a recipe with a single 5-star rating outrank one with
+hundreds of 4.8s, so recipes are ranked by a Bayesian average instead:
+
+    score = (m * C + sum of scores) / (m + number of ratings)
+
+where C is the mean score across all ratings and m (``LEADERBOARD_MIN_VOTES``)
+is how many "average" votes every recipe starts with. Scores and ranks are
+stored in ``LeaderboardEntry`` by a periodic task. A refresh only re-scores
+recipes whose rating aggregates or category changed since their entry was
+written, unless the site-wide mean has drifted, and only rewrites the ranks
+that moved.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import LeaderboardEntry, LeaderboardState, Recipe
+
+MEAN_TOLERANCE = 0.01  # mean drift that forces every score to be recomputed
+
+
+def min_votes():
+    return getattr(settings, "LEADERBOARD_MIN_VOTES", 10)
+
+
+def bayesian_score(rating_count, rating_sum, mean, weight):
+    """
+    Bayesian average of a recipe's ratings.
+
+    Args:
+        rating_count (int): Number of ratings of the recipe.
+        rating_sum (int): Sum of their scores.
+        mean (float): Mean score across all recipes.
+        weight (int): Number of prior votes at the mean.
+
+    Returns:
+        float: The smoothed score.
+    """
+    return (weight * mean + rating_sum) / (weight + rating_count) if weight + rating_count else 0.0
+
+
+def site_mean():
+    """Return the mean score across every rating, from the aggregates stored on recipes."""
+    totals = Recipe.objects.aggregate(count=Sum("rating_count"), total=Sum("rating_sum"))
+    return totals["total"] / totals["count"] if totals["count"] else 0.0
+
+
+def _rerank():
+    """Renumber overall and per-category ranks, writing only the rows whose rank changed."""
+    entries = LeaderboardEntry.objects.only("pk", "category", "rank", "category_rank").order_by(
+        "-score", "-rating_count", "recipe_id"
+    )
+    changed = []
+    category_ranks = {}
+    for rank, entry in enumerate(entries.iterator(), start=1):
+        category_rank = category_ranks[entry.category] = category_ranks.get(entry.category, 0) + 1
+        if (entry.rank, entry.category_rank) != (rank, category_rank):
+            entry.rank, entry.category_rank = rank, category_rank
+            changed.append(entry)
+    LeaderboardEntry.objects.bulk_update(changed, ["rank", "category_rank"], batch_size=500)
+    return len(changed)
+
+
+@transaction.atomic
+def refresh(full=False):
+    """
+    Bring the stored leaderboard up to date with the rating aggregates.
+
+    Args:
+        full (bool): Re-score every rated recipe even if the mean has not moved.
+
+    Returns:
+        int: The number of recipes re-scored.
+    """
+    weight = min_votes()
+    state = LeaderboardState.objects.select_for_update().first() or LeaderboardState.objects.create()
+    current_mean = site_mean()
+    full = full or state.refreshed_at is None or abs(state.mean - current_mean) > MEAN_TOLERANCE
+    # Partial refreshes keep scoring against the stored mean so all entries stay comparable.
+    mean = current_mean if full else state.mean
+
+    LeaderboardEntry.objects.filter(recipe__rating_count=0).delete()
+
+    rated = Recipe.objects.filter(rating_count__gt=0)
+    if not full:
+        rated = rated.filter(
+            Q(leaderboard_entry__isnull=True)
+            | ~Q(leaderboard_entry__rating_count=F("rating_count"))
+            | ~Q(leaderboard_entry__rating_sum=F("rating_sum"))
+            | ~Q(leaderboard_entry__category=F("category"))
+        )
+    rows = list(rated.values_list("pk", "category", "rating_count", "rating_sum"))
+
+    existing = LeaderboardEntry.objects.in_bulk([pk for pk, *_ in rows], field_name="recipe_id")
+    new, updated = [], []
+    for pk, category, rating_count, rating_sum in rows:
+        entry = existing.get(pk) or LeaderboardEntry(recipe_id=pk)
+        entry.category = category
+        entry.rating_count = rating_count
+        entry.rating_sum = rating_sum
+        entry.score = bayesian_score(rating_count, rating_sum, mean, weight)
+        (updated if entry.pk else new).append(entry)
+    LeaderboardEntry.objects.bulk_create(new, batch_size=500)
+    LeaderboardEntry.objects.bulk_update(
+        updated, ["category", "rating_count", "rating_sum", "score"], batch_size=500
+    )
+
+    _rerank()
+    state.mean = mean
+    state.refreshed_at = timezone.now()
+    state.save()
+    return len(rows)
+
+
+def entries(category=None):
+    """
+    Return the stored leaderboard in rank order with recipes and authors loaded.
+
+    Args:
+        category (str, optional): Limit to one recipe category.
+
+    Returns:
+        QuerySet: ``LeaderboardEntry`` rows.
+    """
+    queryset = LeaderboardEntry.objects.select_related("recipe", "recipe__author")
+    if category:
+        return queryset.filter(category=category).order_by("category_rank")
+    return queryset.order_by("rank")
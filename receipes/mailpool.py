@@ -0,0 +1,167 @@
+# mailpool.py
+"""
+A worker-level pool of open mail connections.
+
+``send_mail`` connects, upgrades to TLS, authenticates and disconnects for
+every message, and the handshake dominates the time a notification task
+spends. ``pool`` keeps up to ``EMAIL_POOL_SIZE`` authenticated connections
+open between tasks of a worker process:
+
+* connections idle for longer than ``EMAIL_POOL_IDLE_TIMEOUT`` seconds are
+  closed instead of reused (servers drop idle sessions anyway);
+* a connection idle for more than ``HEALTH_CHECK_AFTER`` seconds is checked
+  with NOOP before it is handed out;
+* ``send_messages`` pushes any number of messages through one connection and,
+  if the server drops it midway, reconnects once and carries on.
+
+The pool is closed when the Celery worker process shuts down (see tasks.py).
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_AFTER = 10  # seconds
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:  # already broken; nothing left to clean up
+        logger.debug("Error closing mail connection", exc_info=True)
+
+
+def _alive(connection):
+    """Whether an idle connection still answers; backends without a socket always do."""
+    if not hasattr(connection, "connection"):
+        return True
+    if connection.connection is None:
+        return False
+    try:
+        return connection.connection.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+class ConnectionPool:
+    """
+    Open mail connections shared by the tasks of one worker process.
+
+    Attributes:
+        options (dict): Keyword arguments for ``django.core.mail.get_connection``
+            (backend, host, port, ...); the EMAIL_* settings by default.
+    """
+
+    def __init__(self, size=None, idle_timeout=None, **options):
+        self._size = size
+        self._idle_timeout = idle_timeout
+        self.options = options
+        self._idle = []  # (released at, connection), most recent last
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size if self._size is not None else settings.EMAIL_POOL_SIZE
+
+    @property
+    def idle_timeout(self):
+        return self._idle_timeout if self._idle_timeout is not None else settings.EMAIL_POOL_IDLE_TIMEOUT
+
+    def _open(self):
+        connection = get_connection(fail_silently=False, **self.options)
+        connection.open()
+        return connection
+
+    def acquire(self):
+        """
+        Take an open connection from the pool, opening a new one if none is usable.
+
+        Returns:
+            BaseEmailBackend: An open connection; hand it back with ``release``.
+        """
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                released_at, connection = self._idle.pop()
+            idle = now - released_at
+            if idle <= self.idle_timeout and (idle <= HEALTH_CHECK_AFTER or _alive(connection)):
+                return connection
+            _close(connection)
+        return self._open()
+
+    def release(self, connection, broken=False):
+        """
+        Return a connection to the pool, closing it if it failed or the pool is full.
+
+        Args:
+            connection (BaseEmailBackend): A connection from ``acquire``.
+            broken (bool): Whether sending over it failed.
+        """
+        if not broken:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((time.monotonic(), connection))
+                    return
+        _close(connection)
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, connection in idle:
+            _close(connection)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block."""
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, broken=True)
+            raise
+        self.release(connection)
+
+    def send_messages(self, messages):
+        """
+        Send messages over one pooled connection, reconnecting once per message
+        if the server has dropped it.
+
+        Args:
+            messages (iterable[EmailMessage]): The messages to send.
+
+        Returns:
+            int: The number of messages sent.
+        """
+        messages = list(messages)
+        if not messages:
+            return 0
+        sent = 0
+        connection = self.acquire()
+        try:
+            for message in messages:
+                try:
+                    sent += connection.send_messages([message])
+                except RECONNECT_ERRORS:
+                    logger.info("Mail connection dropped; reconnecting")
+                    _close(connection)
+                    connection = self._open()
+                    sent += connection.send_messages([message])
+        except BaseException:
+            self.release(connection, broken=True)
+            raise
+        self.release(connection)
+        return sent
+
+
+pool = ConnectionPool()
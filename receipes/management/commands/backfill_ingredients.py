@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from receipes.ingredients import sync_recipe_ingredients
+from receipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Parse Recipe.ingredients into normalized Ingredient rows for existing recipes."
+
+    def handle(self, *args, **options):
+        count = 0
+        for recipe in Recipe.objects.iterator():
+            sync_recipe_ingredients(recipe)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Synced ingredients for {count} recipes."))
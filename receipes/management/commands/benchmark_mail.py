@@ -0,0 +1,55 @@
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from receipes.mailpool import ConnectionPool
+from receipes.smtpsink import SMTPSink
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+class Command(BaseCommand):
+    help = "Compare one SMTP connection per message with the pooled send path against a local SMTP sink."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500, help="Messages to send per mode.")
+        parser.add_argument(
+            "--port", type=int, default=0,
+            help="Port of a running smtp_sink on localhost; by default one is started in-process.",
+        )
+
+    def handle(self, *args, **options):
+        sink = None
+        if options["port"]:
+            address = ("127.0.0.1", options["port"])
+        else:
+            sink = SMTPSink(("127.0.0.1", 0))
+            address = sink.start()
+        connection_options = {
+            "backend": SMTP_BACKEND, "host": address[0], "port": address[1],
+            "username": "", "password": "", "use_tls": False, "use_ssl": False,
+        }
+        messages = [
+            EmailMessage("Benchmark", f"Message {i}", "bench@example.com", [f"user{i}@example.com"])
+            for i in range(options["count"])
+        ]
+
+        start = time.perf_counter()
+        for message in messages:  # what send_mail does
+            get_connection(**connection_options).send_messages([message])
+        self.report("one connection per message", len(messages), time.perf_counter() - start)
+
+        pool = ConnectionPool(size=1, idle_timeout=60, **connection_options)
+        start = time.perf_counter()
+        pool.send_messages(messages)
+        self.report("pooled connection", len(messages), time.perf_counter() - start)
+        pool.close_all()
+
+        if sink is not None:
+            sink.shutdown()
+            sink.server_close()
+            self.stdout.write(f"Sink received {sink.messages} messages in {sink.sessions} sessions.")
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label}: {count} messages in {elapsed:.2f}s ({count / elapsed:.0f}/s)")
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from receipes import blobs
+
+
+class Command(BaseCommand):
+    help = "Delete recipe image files (and their variants) that no recipe has used for the grace period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes", type=int, default=int(blobs.GRACE_PERIOD.total_seconds() // 60),
+            help="Minutes a file must have been unreferenced before it is deleted.",
+        )
+
+    def handle(self, *args, **options):
+        count = blobs.collect(grace=timedelta(minutes=options["grace_minutes"]))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} unreferenced files."))
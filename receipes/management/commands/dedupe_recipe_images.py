@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from receipes import blobs, images
+from receipes.models import ImageBlob, Recipe
+from receipes.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        "Move recipe images saved under their upload name into content-addressed storage, "
+        "then rebuild the image reference counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--collect", action="store_true",
+            help="Delete the files left unreferenced right away instead of after the grace period.",
+        )
+
+    def handle(self, *args, **options):
+        storage = blobs.image_storage()
+        moved = {}  # legacy name -> content-addressed name
+        for recipe in Recipe.objects.exclude(image="").only("pk", "image", "image_variants").iterator():
+            old = recipe.image.name
+            if is_content_addressed(old):
+                continue
+            if old not in moved:
+                if not storage.exists(old):
+                    self.stderr.write(f"Recipe {recipe.pk}: {old} is missing")
+                    continue
+                with storage.open(old, "rb") as f:
+                    moved[old] = storage.save(old, f)
+            Recipe.objects.filter(pk=recipe.pk, image=old).update(image=moved[old], updated_at=timezone.now())
+            recipe.image.name = moved[old]
+            images.generate_variants(recipe)
+
+        # Give the legacy files a row so the collector deletes them once nothing uses them.
+        now = timezone.now()
+        known = set(ImageBlob.objects.filter(name__in=moved).values_list("name", flat=True))
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name, unreferenced_since=now) for name in moved.keys() - known]
+        )
+        referenced = blobs.recount()
+        self.stdout.write(
+            f"Moved {len(moved)} files into {len(set(moved.values()))} content-addressed blobs; "
+            f"{referenced} files are in use."
+        )
+        if options["collect"]:
+            deleted = blobs.collect(grace=timedelta(0))
+            self.stdout.write(f"Deleted {deleted} unreferenced files.")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from receipes import images
+from receipes.models import Recipe
+from receipes.tasks import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = "Generate the responsive JPEG/WebP variants and placeholders of recipe images that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate variants of every image.")
+        parser.add_argument("--queue", action="store_true", help="Queue Celery tasks instead of working inline.")
+
+    def handle(self, *args, **options):
+        count = failed = 0
+        for recipe in Recipe.objects.exclude(image="").only("pk", "image", "image_variants", "image_width").iterator():
+            current = (recipe.image_variants or {}).get("source") == recipe.image.name and recipe.image_width
+            if not options["all"] and current:
+                continue
+            if options["queue"]:
+                generate_image_variants.delay(recipe.pk)
+            else:
+                try:
+                    images.generate_variants(recipe)
+                except (OSError, ValueError) as e:  # missing or unreadable file
+                    failed += 1
+                    self.stderr.write(f"Recipe {recipe.pk} ({recipe.image.name}): {e}")
+                    continue
+            count += 1
+        verb = "Queued" if options["queue"] else "Generated"
+        self.stdout.write(self.style.SUCCESS(f"{verb} variants for {count} recipes ({failed} failed)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from receipes import facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the category / cooking-time facet counts from the recipe table."
+
+    def handle(self, *args, **options):
+        count = facets.rebuild_counts()
+        self.stdout.write(self.style.SUCCESS(f"Counted {count} recipes."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from receipes import fuzzy, search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text and title trigram search indexes from the recipe table."
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index()
+        fuzzy.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} recipes."))
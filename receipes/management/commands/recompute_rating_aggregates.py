@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from receipes import ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute the rating count, sum and histogram stored on each recipe from the rating table."
+
+    def handle(self, *args, **options):
+        count = ratings.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {count} recipes."))
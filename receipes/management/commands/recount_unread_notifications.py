@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from receipes import notifications
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user unread notification counters from the notifications table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_ids", nargs="*", type=int, help="Only repair these users.")
+
+    def handle(self, *args, **options):
+        fixed = notifications.recount(options["user_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} unread notification counters."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from receipes import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Re-score recipes whose ratings changed and re-rank the top-rated leaderboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Re-score every rated recipe.")
+
+    def handle(self, *args, **options):
+        count = leaderboard.refresh(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"Re-scored {count} recipes."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from receipes.smtpsink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = "Run a local SMTP server that discards all mail, for benchmarking notification delivery offline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=1025)
+
+    def handle(self, *args, **options):
+        sink = SMTPSink((options["host"], options["port"]))
+        self.stdout.write(f"SMTP sink listening on {options['host']}:{options['port']} (Ctrl+C to stop)")
+        try:
+            sink.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sink.server_close()
+        self.stdout.write(self.style.SUCCESS(f"Received {sink.messages} messages in {sink.sessions} sessions."))
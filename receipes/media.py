@@ -0,0 +1,167 @@
+# media.py
+"""
+Serving of uploaded media files (``MEDIA_URL``).
+
+``settings.MEDIA_SERVE`` selects how the bytes reach the client:
+
+* ``"django"`` streams the file from Python, honouring single byte ranges;
+  meant for development;
+* ``"x-sendfile"`` (Apache mod_xsendfile, lighttpd) and ``"x-accel-redirect"``
+  (nginx, with an ``internal`` location aliased to ``MEDIA_ROOT`` at
+  ``MEDIA_ACCEL_REDIRECT_PREFIX``) only check the file and set the headers; the
+  front server sends the file itself, including range requests;
+* ``""`` registers no view; the front server serves ``MEDIA_ROOT`` directly.
+
+Content-addressed images and their variants never change under the same name
+(see storage.py and images.py), so they are cached for a year as
+``immutable``; other files get ``MEDIA_MAX_AGE`` and revalidate with
+Last-Modified.
+"""
+
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from . import images
+from .storage import is_content_addressed
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+VARIANT_NAME_RE = re.compile(rf"^{re.escape(images.VARIANT_DIR)}/[0-9a-f]{{64}}-\w+\.\w+$")
+CHUNK_SIZE = 64 * 1024
+
+
+def is_immutable(name):
+    """Whether a media file's contents are fixed by its name (a content hash or a variant of one)."""
+    return is_content_addressed(name) or bool(VARIANT_NAME_RE.match(name))
+
+
+def parse_range(header, size):
+    """
+    Resolve a ``Range`` header against a file size.
+
+    Only a single ``bytes`` range is honoured; anything else is answered with
+    the whole file, as RFC 9110 allows.
+
+    Args:
+        header (str): The Range header value, possibly empty.
+        size (int): File size in bytes.
+
+    Returns:
+        tuple[int, int] | None: First and last byte offsets (inclusive), or
+        None to send the whole file.
+
+    Raises:
+        ValueError: If the range lies beyond the end of the file (416).
+    """
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header or "")
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:  # no bytes to satisfy it
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        if first >= size:
+            raise ValueError(header)
+        return None  # last < first: syntactically invalid, ignore
+    return first, last
+
+
+def _read_range(path, first, length):
+    with open(path, "rb") as f:
+        f.seek(first)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _stream(request, fullpath, stat, content_type):
+    """Send the file from Python, as a 206 partial response when a usable range was requested."""
+    last_modified = http_date(stat.st_mtime)
+    header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != last_modified:  # changed since the client's partial copy
+        header = None
+    try:
+        byte_range = parse_range(header, stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+    if byte_range is None:
+        return FileResponse(open(fullpath, "rb"), content_type=content_type)
+    first, last = byte_range
+    response = StreamingHttpResponse(
+        _read_range(fullpath, first, last - first + 1), status=206, content_type=content_type
+    )
+    response["Content-Length"] = last - first + 1
+    response["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serve a file below ``MEDIA_ROOT`` in the configured ``MEDIA_SERVE`` mode.
+
+    Args:
+        path (str): The file's name relative to ``MEDIA_ROOT``.
+
+    Returns:
+        HttpResponse: The file, a range of it, a front-server redirect header
+        or 304 Not Modified.
+
+    Raises:
+        Http404: If the path is outside ``MEDIA_ROOT`` or not a file.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Media file not found")
+    if not fullpath.is_file():
+        raise Http404("Media file not found")
+
+    stat = fullpath.stat()
+    if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type, encoding = mimetypes.guess_type(str(fullpath))
+        content_type = content_type or "application/octet-stream"
+        mode = settings.MEDIA_SERVE
+        if mode == "x-sendfile":
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = str(fullpath)
+        elif mode == "x-accel-redirect":
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        else:
+            response = _stream(request, fullpath, stat, content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Accept-Ranges"] = "bytes"
+
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if is_immutable(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
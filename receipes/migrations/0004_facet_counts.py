@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipes', '0003_ingredients'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=20)),
+                ('time_bucket', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', 'cooking_time'], name='recipe_category_time_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipefacetcount',
+            unique_together={('category', 'time_bucket')},
+        ),
+    ]
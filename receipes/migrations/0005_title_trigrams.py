@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipes', '0004_facet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='title_trigrams', to='receipes.recipe')),
+            ],
+            options={
+                'unique_together': {('trigram', 'recipe')},
+            },
+        ),
+    ]
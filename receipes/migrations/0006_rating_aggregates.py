@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:19
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('receipes', 'Recipe')
+    annotations = {'actual_count': Count('ratings'), 'actual_sum': Sum('ratings__score', default=0)}
+    for score in range(1, 6):
+        annotations[f'actual_{score}'] = Count('ratings', filter=Q(ratings__score=score))
+    for row in Recipe.objects.annotate(**annotations).values('pk', *annotations).iterator():
+        values = {'rating_count': row['actual_count'], 'rating_sum': row['actual_sum']}
+        values.update({f'score_{score}_count': row[f'actual_{score}'] for score in range(1, 6)})
+        Recipe.objects.filter(pk=row['pk']).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipes', '0005_title_trigrams'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='score_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='score_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='score_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='score_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='score_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
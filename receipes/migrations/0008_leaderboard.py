@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipes', '0007_comment_pagination_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean', models.FloatField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=20)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('rank', models.PositiveIntegerField(default=0)),
+                ('category_rank', models.PositiveIntegerField(default=0)),
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='receipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rank'], name='leaderboard_rank_idx'), models.Index(fields=['category', 'category_rank'], name='leaderboard_category_rank_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:46
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_notifications_emailed(apps, schema_editor):
+    # They were emailed one by one when created; keep them out of the first digest.
+    Notification = apps.get_model('receipes', 'Notification')
+    Notification.objects.update(emailed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipes', '0013_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='email_frequency',
+            field=models.CharField(choices=[('immediate', 'One email per notification'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=10, verbose_name='notification emails'),
+        ),
+        migrations.RunPython(mark_existing_notifications_emailed, migrations.RunPython.noop),
+    ]
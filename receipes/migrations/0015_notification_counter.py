@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_notification_counters(apps, schema_editor):
+    Notification = apps.get_model('receipes', 'Notification')
+    NotificationCounter = apps.get_model('receipes', 'NotificationCounter')
+    counts = Notification.objects.filter(read=False).values('recipient').annotate(n=Count('pk'))
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row['recipient'], unread=row['n']) for row in counts.iterator()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('receipes', '0014_notification_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_notification_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+def fill_impacts(apps, schema_editor):
+    SearchPosting = apps.get_model('receipes', 'SearchPosting')
+    SearchStats = apps.get_model('receipes', 'SearchStats')
+    stats = SearchStats.objects.first()
+    if stats is None or not stats.document_count:
+        return
+    average_length = stats.total_length / stats.document_count or 1.0
+    k1, b = 1.2, 0.75  # search.BM25_K1 / BM25_B
+    batch = []
+    for posting in SearchPosting.objects.select_related('recipe').only(
+        'pk', 'term_frequency', 'recipe__search_length'
+    ).iterator():
+        frequency = posting.term_frequency
+        norm = k1 * (1 - b + b * posting.recipe.search_length / average_length)
+        posting.impact = frequency * (k1 + 1) / (frequency + norm)
+        batch.append(posting)
+        if len(batch) >= 1000:
+            SearchPosting.objects.bulk_update(batch, ['impact'])
+            batch = []
+    SearchPosting.objects.bulk_update(batch, ['impact'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipes', '0016_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchposting',
+            name='impact',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', '-impact'], name='search_posting_impact_idx'),
+        ),
+        migrations.RunPython(fill_impacts, migrations.RunPython.noop),
+    ]
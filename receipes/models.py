@@ -2,14 +2,29 @@ from django.contrib.auth.models import User
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator,MaxValueValidator
+from django.core.files.storage import default_storage
 from django.utils import timezone
 
+from .storage import recipe_image_storage
+
 # Create your models here.
 
 
 class Profile(models.Model):
+    EMAIL_IMMEDIATE = 'immediate'
+    EMAIL_HOURLY = 'hourly'
+    EMAIL_DAILY = 'daily'
+    EMAIL_FREQUENCY_CHOICES = [
+        (EMAIL_IMMEDIATE, 'One email per notification'),
+        (EMAIL_HOURLY, 'Hourly digest'),
+        (EMAIL_DAILY, 'Daily digest'),
+    ]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
+    email_frequency = models.CharField(
+        'notification emails', max_length=10, choices=EMAIL_FREQUENCY_CHOICES, default=EMAIL_IMMEDIATE
+    )
 
     def __str__(self):
         return self.user.username
@@ -28,20 +43,139 @@ class Recipe(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     cooking_time = models.IntegerField()  # in minutes
     author = models.ForeignKey(User, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='recipes/', blank=True)
+    image = models.ImageField(upload_to='recipes/', blank=True, storage=recipe_image_storage)  # stored by content hash
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # also bumped by comment/rating activity (conditional.touch_recipe)
+    search_length = models.PositiveIntegerField(default=0, editable=False)  # indexed token count, used by BM25
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)  # parsed Ingredient rows linked to this recipe
+
+    # Rating aggregates, kept in step with Rating rows by signals (see ratings.py).
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    score_1_count = models.PositiveIntegerField(default=0, editable=False)
+    score_2_count = models.PositiveIntegerField(default=0, editable=False)
+    score_3_count = models.PositiveIntegerField(default=0, editable=False)
+    score_4_count = models.PositiveIntegerField(default=0, editable=False)
+    score_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Uploads are verified and normalized off-request; until then the image is "processing".
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+    image_status = models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY, editable=False)
+
+    # Downscaled JPEG/WebP copies of ``image``, written by a background task (see images.py).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Computed with the variants so pages can reserve the image's box and paint a
+    # placeholder before fetching any image bytes: the displayed size, the
+    # dominant colour as "#rrggbb" and a tiny blurred preview as a data: URI.
+    image_width = models.PositiveIntegerField(default=0, editable=False)
+    image_height = models.PositiveIntegerField(default=0, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    image_lqip = models.TextField(blank=True, editable=False)
 
+    # Columns maintained with targeted UPDATEs; a full save() of a possibly stale
+    # instance must not overwrite them.
+    DERIVED_FIELDS = frozenset({
+        'search_length', 'ingredient_count', 'rating_count', 'rating_sum',
+        'score_1_count', 'score_2_count', 'score_3_count', 'score_4_count', 'score_5_count',
+        'image_status', 'image_variants', 'image_width', 'image_height', 'image_color', 'image_lqip',
+    })
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'cooking_time'], name='recipe_category_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def average_rating(self):
+        """Mean score, or None when the recipe has no ratings."""
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def _current_image_variants(self):
+        """The variants record of the current image, or {} if it is missing or stale."""
+        record = self.image_variants or {}
+        if not self.image or record.get('source') != self.image.name:
+            return {}
+        return record
+
+    def _image_srcset(self, key):
+        variants = self._current_image_variants().get('variants')
+        if not variants:
+            return ''
+        candidates = [f"{default_storage.url(variant[key])} {variant['width']}w" for variant in variants]
+        if key == 'jpeg':
+            candidates.append(f"{self.image.url} {self.image_variants['width']}w")
+        return ', '.join(candidates)
+
+    @property
+    def image_srcset(self):
+        """``srcset`` of the JPEG variants plus the original upload, or '' until they exist."""
+        return self._image_srcset('jpeg')
+
+    @property
+    def image_webp_srcset(self):
+        """``srcset`` of the WebP variants, or '' until they exist."""
+        return self._image_srcset('webp')
+
+    @property
+    def image_animation(self):
+        """URLs of the animated WebP and still poster of an animated image, or None until they exist."""
+        animated = self._current_image_variants().get('animated')
+        if not animated:
+            return None
+        return {
+            'webp_url': default_storage.url(animated['webp']),
+            'poster_url': default_storage.url(animated['poster']),
+        }
+
+    @property
+    def image_placeholder(self):
+        """Width, height and inline placeholder ``style`` of the current image, or None until computed."""
+        if not self._current_image_variants() or not self.image_width:
+            return None
+        background = self.image_color or '#e9ecef'
+        if self.image_lqip:
+            background += f' url("{self.image_lqip}") center / cover no-repeat'
+        return {'width': self.image_width, 'height': self.image_height, 'style': f'background: {background};'}
+
+    @property
+    def rating_histogram(self):
+        """List of (score, count, percent of all ratings) from 5 down to 1."""
+        return [
+            (score, count, round(100 * count / self.rating_count) if self.rating_count else 0)
+            for score in range(5, 0, -1)
+            for count in [getattr(self, f'score_{score}_count')]
+        ]
+
 class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
-    
+
+    class Meta:
+        indexes = [
+            # serves the newest-first, cursor-paginated comment list of a recipe
+            models.Index(fields=['recipe', 'created_at', 'id'], name='comment_recipe_created_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author} on {self.recipe}'
@@ -74,4 +208,132 @@ class Notification(models.Model):
     sender = models.ForeignKey(User, related_name='sent_notifications', on_delete=models.CASCADE, null=True, blank=True)
     message = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
-    read = models.BooleanField(default=False)
\ No newline at end of file
+    read = models.BooleanField(default=False)
+    # When the notification was emailed (alone or in a digest); None while pending.
+    emailed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Inbox pages, newest first, with and without the "unread only" filter (keyset pagination).
+            models.Index(fields=['recipient', 'read', 'created_at', 'id'], name='notification_inbox_read_idx'),
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notification_inbox_idx'),
+        ]
+
+
+class NotificationCounter(models.Model):
+    """A user's number of unread notifications, kept up to date by notifications.py."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
+
+class SearchTerm(models.Model):
+    """A token of the full-text search index and the number of recipes containing it."""
+    term = models.CharField(max_length=64, unique=True)
+    doc_frequency = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.term
+
+
+class SearchPosting(models.Model):
+    """Posting list entry: how many times a term occurs in a recipe."""
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE, related_name='postings')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='search_postings')
+    term_frequency = models.PositiveIntegerField()
+    # BM25 term weight (without idf) at indexing time; orders each posting list best first.
+    impact = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('term', 'recipe')
+        indexes = [
+            models.Index(fields=['term', '-impact'], name='search_posting_impact_idx'),
+        ]
+
+
+class TitleTrigram(models.Model):
+    """A character trigram of a recipe title, used for typo-tolerant title search."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='title_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('trigram', 'recipe')
+
+
+class SearchStats(models.Model):
+    """Single row holding the corpus totals BM25 needs (document count and total length)."""
+    document_count = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+
+class Ingredient(models.Model):
+    """A normalized ingredient name parsed out of ``Recipe.ingredients``."""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """Join table linking a recipe to each of its parsed ingredients."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='recipe_ingredients')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='recipe_ingredients')
+
+    class Meta:
+        unique_together = ('ingredient', 'recipe')
+
+
+class RecipeFacetCount(models.Model):
+    """Number of recipes per (category, cooking-time bucket), maintained on recipe save/delete."""
+    category = models.CharField(max_length=20)
+    time_bucket = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('category', 'time_bucket')
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A rated recipe's Bayesian-averaged score and its rank, overall and within its category.
+
+    ``rating_count``, ``rating_sum`` and ``category`` are snapshots of the recipe taken
+    when the score was computed; a recipe whose live values differ is re-scored on the
+    next refresh (see leaderboard.py).
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    category = models.CharField(max_length=20)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    rank = models.PositiveIntegerField(default=0)
+    category_rank = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rank'], name='leaderboard_rank_idx'),
+            models.Index(fields=['category', 'category_rank'], name='leaderboard_category_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.rank} {self.recipe_id} ({self.score:.2f})'
+
+
+class LeaderboardState(models.Model):
+    """Single row holding the site-wide mean score the stored leaderboard was computed with."""
+    mean = models.FloatField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+
+class ImageBlob(models.Model):
+    """
+    A stored image file and the number of recipes using it.
+
+    Files are content-addressed and shared (see storage.py); one whose count
+    has stayed at zero past a grace period is deleted by ``blobs.collect``.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.IntegerField(default=0)
+    unreferenced_since = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
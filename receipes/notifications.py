@@ -0,0 +1,312 @@
+# notifications.py
+"""
+Creating notifications and emailing them to their recipients.
+
+``deliver`` takes any number of (recipient_id, sender_id, message) entries and
+handles them together: one query resolves every user, notifications are
+written with ``bulk_create`` in chunks of ``BATCH_SIZE`` and all emails go
+out over a single pooled mail connection (see mailpool.py). Fanning an event out to many users
+therefore costs a few queries per chunk instead of one task per recipient.
+
+Each user chooses how they are emailed (``Profile.email_frequency``). Users
+who want one email per notification get it right away. For the others the
+notification stays pending (``emailed_at`` is None) until ``send_digests``,
+run hourly and daily by celery beat, mails each recipient one digest of
+everything pending and marks it all sent with one UPDATE per chunk.
+
+Every user's number of unread notifications is kept in NotificationCounter,
+adjusted with atomic ``F()`` updates whenever notifications are created or
+marked read, and cached so pages can show it without a query
+(``unread_count``). ``recount`` rebuilds the counters from the notifications.
+
+Once written, new notifications are also pushed over the channel layer to the
+recipient's open WebSockets (see consumers.py).
+"""
+
+import logging
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import caching
+from .mailpool import pool
+from .models import Notification, NotificationCounter, Profile, User
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+SUBJECT = "New Notification"
+
+
+def user_group(user_id):
+    """Channel layer group of a user's open notification sockets."""
+    return f"notifications.user.{user_id}"
+
+
+def _publish(notifications, usernames):
+    """Push new notifications to their recipients' sockets; delivery never fails because of it."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        for notification in notifications:
+            async_to_sync(channel_layer.group_send)(user_group(notification.recipient_id), {
+                "type": "notification.message",
+                "notification": {
+                    "id": notification.pk,
+                    "message": notification.message,
+                    "sender": usernames.get(notification.sender_id),
+                    "created_at": notification.created_at.isoformat(),
+                },
+            })
+    except Exception:
+        logger.warning("Could not push %d notifications", len(notifications), exc_info=True)
+
+
+def _fetch_pks(notifications, after=0):
+    """
+    Fill in primary keys that ``bulk_create`` could not return (MySQL).
+
+    The notifications of one ``deliver`` call share ``created_at``, so the
+    rows are found by recipient and timestamp (past ``after``, the last key of
+    the previous chunk) and matched up by message in insertion order.
+    """
+    pks = defaultdict(list)
+    rows = Notification.objects.filter(
+        recipient_id__in={notification.recipient_id for notification in notifications},
+        created_at=notifications[0].created_at,
+        pk__gt=after,
+    ).order_by("-pk").values_list("pk", "recipient_id", "message")
+    for pk, recipient_id, message in rows:
+        pks[recipient_id, message].append(pk)
+    for notification in notifications:
+        notification.pk = pks[notification.recipient_id, notification.message].pop()
+
+
+def unread_count(user_id):
+    """
+    Return a user's number of unread notifications, from the cache when possible.
+
+    Args:
+        user_id (int): Primary key of the user.
+
+    Returns:
+        int: The count.
+    """
+    key = caching.unread_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = NotificationCounter.objects.filter(user_id=user_id).values_list("unread", flat=True).first() or 0
+        cache.set(key, count, caching.UNREAD_TIMEOUT)
+    return max(count, 0)
+
+
+def _adjust_unread(deltas):
+    """
+    Add to users' unread counters, one UPDATE per distinct amount.
+
+    Args:
+        deltas (dict): Amount to add (negative to subtract) by user id.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in deltas], ignore_conflicts=True
+    )
+    by_amount = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_amount[delta].append(user_id)
+    for delta, user_ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F("unread") + delta)
+    cache.delete_many([caching.unread_count_key(user_id) for user_id in deltas])
+
+
+@transaction.atomic
+def mark_read(user, notification_ids=None):
+    """
+    Mark some or all of a user's notifications read with a single UPDATE.
+
+    Args:
+        user (User): The recipient.
+        notification_ids (iterable[int], optional): The notifications to mark; all when None.
+            Ids of other users' notifications are ignored.
+
+    Returns:
+        int: The number of notifications that were unread.
+    """
+    unread = Notification.objects.filter(recipient=user, read=False)
+    if notification_ids is not None:
+        unread = unread.filter(pk__in=list(notification_ids))
+    marked = unread.update(read=True)
+    _adjust_unread({user.pk: -marked})
+    return marked
+
+
+@transaction.atomic
+def recount(user_ids=None):
+    """
+    Rebuild unread counters from the notifications table.
+
+    Args:
+        user_ids (iterable[int], optional): Users to repair; everyone when None.
+
+    Returns:
+        int: The number of counters that were wrong.
+    """
+    unread = Notification.objects.filter(read=False)
+    counters = NotificationCounter.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        unread = unread.filter(recipient_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+    actual = dict(unread.values("recipient").annotate(n=Count("pk")).values_list("recipient", "n"))
+    stored = dict(counters.values_list("user_id", "unread"))
+    wrong = {user_id for user_id in actual.keys() | stored.keys() if actual.get(user_id, 0) != stored.get(user_id, 0)}
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in wrong - stored.keys()], ignore_conflicts=True
+    )
+    NotificationCounter.objects.bulk_update(
+        [NotificationCounter(user_id=user_id, unread=actual.get(user_id, 0)) for user_id in wrong],
+        ["unread"], batch_size=500,
+    )
+    cache.delete_many([caching.unread_count_key(user_id) for user_id in wrong])
+    return len(wrong)
+
+
+def deliver(entries, batch_size=BATCH_SIZE):
+    """
+    Create notifications, emailing those whose recipient wants immediate emails.
+
+    A notification is marked emailed only after its chunk was sent, so one
+    that could not be sent stays pending and goes out with the next hourly
+    digest.
+
+    Args:
+        entries (iterable): (recipient_id, sender_id, message) triples; sender_id may be None.
+            Entries whose recipient no longer exists are skipped.
+        batch_size (int): Notifications written and emailed per chunk.
+
+    Returns:
+        int: The number of notifications created.
+    """
+    entries = [tuple(entry) for entry in entries]
+    if not entries:
+        return 0
+    user_ids = {recipient_id for recipient_id, _, _ in entries}
+    user_ids |= {sender_id for _, sender_id, _ in entries if sender_id}
+    users = {
+        pk: (email, frequency or Profile.EMAIL_IMMEDIATE, username)
+        for pk, email, frequency, username in User.objects.filter(pk__in=user_ids).values_list(
+            "pk", "email", "profile__email_frequency", "username"
+        )
+    }
+    now = timezone.now()
+    notifications = [
+        Notification(
+            recipient_id=recipient_id,
+            sender_id=sender_id if sender_id in users else None,
+            message=message,
+            created_at=now,
+        )
+        for recipient_id, sender_id, message in entries
+        if recipient_id in users
+    ]
+
+    usernames = {pk: username for pk, (_, _, username) in users.items()}
+    for start in range(0, len(notifications), batch_size):
+        chunk = notifications[start:start + batch_size]
+        with transaction.atomic():
+            Notification.objects.bulk_create(chunk)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                _fetch_pks(chunk, after=notifications[start - 1].pk if start else 0)
+            _adjust_unread(Counter(notification.recipient_id for notification in chunk))
+        _publish(chunk, usernames)
+        immediate = [
+            notification for notification in chunk
+            if users[notification.recipient_id][1] == Profile.EMAIL_IMMEDIATE
+        ]
+        try:
+            pool.send_messages([
+                EmailMessage(SUBJECT, notification.message, settings.DEFAULT_FROM_EMAIL, [email])
+                for notification in immediate
+                for email in [users[notification.recipient_id][0]]
+                if email
+            ])
+        except Exception:
+            logger.warning("Could not email %d notifications; left for the hourly digest", len(immediate), exc_info=True)
+        else:
+            if immediate:
+                Notification.objects.filter(pk__in=[notification.pk for notification in immediate]).update(
+                    emailed_at=timezone.now()
+                )
+    if len(notifications) > 1:
+        logger.info("Delivered %d notifications", len(notifications))
+    return len(notifications)
+
+
+def _digest_message(recipient, notifications):
+    count = len(notifications)
+    subject = f"{count} new notification{'s' if count != 1 else ''}"
+    body = render_to_string(
+        "emails/notification_digest.txt", {"recipient": recipient, "notifications": notifications}
+    )
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+
+
+def send_digests(frequency, batch_size=BATCH_SIZE):
+    """
+    Email every recipient with the given preference one digest of their pending notifications.
+
+    The hourly run also picks up notifications left pending by users who have
+    since switched to immediate emails.
+
+    Args:
+        frequency (str): ``Profile.EMAIL_HOURLY`` or ``Profile.EMAIL_DAILY``.
+        batch_size (int): Roughly how many notifications are digested and marked per chunk.
+
+    Returns:
+        int: The number of digests sent.
+    """
+    audience = Q(recipient__profile__email_frequency=frequency)
+    if frequency == Profile.EMAIL_HOURLY:
+        audience |= Q(recipient__profile__email_frequency=Profile.EMAIL_IMMEDIATE)
+        audience |= Q(recipient__profile__isnull=True)
+    pending = (
+        Notification.objects.filter(audience, emailed_at__isnull=True)
+        .select_related("recipient")
+        .order_by("recipient_id", "created_at", "pk")
+    )
+
+    sent = 0
+    messages, notification_ids = [], []
+
+    def flush():
+        pool.send_messages(messages)
+        Notification.objects.filter(pk__in=notification_ids).update(emailed_at=timezone.now())
+        messages.clear()
+        notification_ids.clear()
+
+    for _, group in groupby(pending.iterator(chunk_size=batch_size), key=lambda n: n.recipient_id):
+        group = list(group)
+        recipient = group[0].recipient
+        if recipient.email:
+            messages.append(_digest_message(recipient, group))
+            sent += 1
+        notification_ids.extend(notification.pk for notification in group)
+        if len(notification_ids) >= batch_size:
+            flush()
+    if notification_ids:
+        flush()
+    if sent:
+        logger.info("Sent %d %s notification digests", sent, frequency)
+    return sent
@@ -0,0 +1,191 @@
+# pagination.py
+"""
+Keyset (cursor) pagination.
+
+Instead of ``COUNT(*)`` plus ``OFFSET``, each page is fetched with a range
+condition on the ordering columns starting from the last row of the previous
+page, so page 100 costs the same indexed lookup as page 1.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor string cannot be decoded."""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """JSON encoder that keeps datetimes to the microsecond (Django's truncates to milliseconds)."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    """
+    Build an opaque cursor string.
+
+    Args:
+        direction (str): "next" or "previous".
+        values (list): Ordering column values of the boundary row.
+
+    Returns:
+        str: A URL-safe cursor.
+    """
+    raw = json.dumps([direction, *values], separators=(",", ":"), cls=CursorEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Args:
+        cursor (str): The opaque cursor string.
+
+    Returns:
+        tuple[str, list]: The direction and the boundary row values.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursor(cursor) from e
+    if direction not in ("next", "previous"):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class CursorPage:
+    """
+    A page of results with opaque cursors to its neighbours.
+
+    Mirrors the parts of ``django.core.paginator.Page`` used by templates
+    (iteration, ``len``, ``has_next``/``has_previous``).
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a unique ordering without counting it.
+
+    Attributes:
+        queryset (QuerySet): The (possibly filtered) rows to paginate.
+        per_page (int): Number of rows per page.
+        ordering (tuple[str]): Field names forming a unique sort key, "-" prefixed
+            for descending; the last one should be the primary key.
+    """
+
+    def __init__(self, queryset, per_page, ordering=("title", "id")):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+
+    @property
+    def _fields(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    def _after(self, values, reverse=False):
+        """Build the row-value condition "comes after (v1, v2, ...) in this ordering" as a Q object."""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith("-")
+            lookup = "lt" if descending != reverse else "gt"
+            term = Q(**{f"{field.lstrip('-')}__{lookup}": values[i]})
+            for prefix_field, value in zip(self._fields[:i], values[:i]):
+                term &= Q(**{prefix_field: value})
+            condition |= term
+        return condition
+
+    def _coerce(self, values, cursor):
+        """Convert decoded cursor values to their ordering fields' Python types."""
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        coerced = []
+        for name, value in zip(self._fields, values):
+            try:
+                value = self.queryset.model._meta.get_field(name).to_python(value)
+            except (ValidationError, ValueError, TypeError) as e:
+                raise InvalidCursor(cursor) from e
+            if value is None:
+                raise InvalidCursor(cursor)
+            coerced.append(value)
+        return coerced
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field in self._fields]
+
+    def page(self, cursor=None):
+        """
+        Fetch the page addressed by a cursor (the first page when None).
+
+        Args:
+            cursor (str, optional): A cursor from a previous page.
+
+        Returns:
+            CursorPage: The requested page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed or its values do not fit
+                the ordering fields.
+        """
+        direction, values = decode_cursor(cursor) if cursor else ("next", None)
+        if values is not None:
+            values = self._coerce(values, cursor)
+        backwards = direction == "previous"
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse=backwards))
+        order = [
+            (field[1:] if field.startswith("-") else f"-{field}") if backwards else field
+            for field in self.ordering
+        ]
+        rows = list(queryset.order_by(*order)[: self.per_page + 1])
+
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows)
+
+        has_next = has_more if not backwards else True
+        has_previous = has_more if backwards else values is not None
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor("next", self._key(rows[-1])) if has_next else None,
+            previous_cursor=encode_cursor("previous", self._key(rows[0])) if has_previous else None,
+        )
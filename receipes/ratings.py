@@ -0,0 +1,79 @@
+# ratings.py
+"""
+Rating aggregates stored on ``Recipe``.
+
+``rating_count``, ``rating_sum`` and the per-score ``score_N_count`` columns
+are adjusted with F-expressions whenever a ``Rating`` is created, changed or
+deleted, so the average and histogram of a recipe come from its own row.
+``recompute`` rebuilds them from the rating table.
+"""
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Rating, Recipe
+
+SCORES = range(1, 6)
+
+
+def apply_change(recipe_id, old_score=None, new_score=None):
+    """
+    Move a recipe's aggregates from one score to another in a single UPDATE,
+    which also bumps ``updated_at`` since the recipe page changes.
+
+    Args:
+        recipe_id (int): The rated recipe.
+        old_score (int, optional): The previous score; None for a new rating.
+        new_score (int, optional): The current score; None for a deleted rating.
+    """
+    if old_score == new_score:
+        return
+    changes = {"updated_at": timezone.now()}
+    if old_score is None:
+        changes["rating_count"] = F("rating_count") + 1
+    elif new_score is None:
+        changes["rating_count"] = F("rating_count") - 1
+    changes["rating_sum"] = F("rating_sum") + (new_score or 0) - (old_score or 0)
+    if old_score is not None:
+        changes[f"score_{old_score}_count"] = F(f"score_{old_score}_count") - 1
+    if new_score is not None:
+        changes[f"score_{new_score}_count"] = F(f"score_{new_score}_count") + 1
+    Recipe.objects.filter(pk=recipe_id).update(**changes)
+
+
+def recompute(recipes=None):
+    """
+    Recalculate the aggregates from the rating table.
+
+    Args:
+        recipes (QuerySet, optional): Recipes to repair; all recipes by default.
+
+    Returns:
+        int: The number of recipes updated.
+    """
+    recipes = Recipe.objects.all() if recipes is None else recipes
+    annotations = {
+        "actual_count": Count("ratings"),
+        "actual_sum": Sum("ratings__score", default=0),
+    }
+    for score in SCORES:
+        annotations[f"actual_{score}"] = Count("ratings", filter=Q(ratings__score=score))
+
+    updated = 0
+    for row in recipes.annotate(**annotations).values("pk", *annotations).iterator():
+        values = {"rating_count": row["actual_count"], "rating_sum": row["actual_sum"]}
+        values.update({f"score_{score}_count": row[f"actual_{score}"] for score in SCORES})
+        updated += Recipe.objects.filter(pk=row["pk"]).update(**values)
+    return updated
+
+
+def stored_score(rating):
+    """
+    Return the (recipe id, score) currently stored for a rating, or None if it is new.
+
+    Args:
+        rating (Rating): A rating about to be saved.
+    """
+    if rating._state.adding or rating.pk is None:
+        return None
+    return Rating.objects.filter(pk=rating.pk).values_list("recipe_id", "score").first()
@@ -0,0 +1,10 @@
+# routing.py
+"""WebSocket URL routes, mounted by myproject/asgi.py."""
+
+from django.urls import path
+
+from .consumers import NotificationConsumer
+
+websocket_urlpatterns = [
+    path("ws/notifications/", NotificationConsumer.as_asgi(), name="notification_socket"),
+]
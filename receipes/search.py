@@ -0,0 +1,344 @@
+# search.py
+"""
+Full-text search over recipes backed by an inverted index.
+
+Every recipe is tokenized (title, ingredients and instructions) into
+``SearchPosting`` rows, one per distinct term, holding the term frequency.
+``SearchTerm`` keeps the document frequency of each term and ``SearchStats``
+the corpus totals, so a query only touches the posting lists of its own
+terms and is ranked with Okapi BM25 without scanning the recipe table.
+
+Each posting also stores its BM25 weight (``impact``) and posting lists are
+indexed best first, so a query reads at most ``CANDIDATES_PER_TERM`` postings
+per term, whatever their length, and scores only those candidates exactly.
+Impacts use the average recipe length of the time they were written;
+``refresh_impacts`` (run by ``rebuild_index``) rescores every posting
+against the current average once the corpus has drifted.
+"""
+
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Recipe, SearchPosting, SearchStats, SearchTerm
+
+# BM25 tuning constants (standard defaults).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TITLE_WEIGHT = 2  # title tokens are counted twice so title matches rank higher
+
+# Postings read per query term, best impact first; bounds the work of common terms.
+CANDIDATES_PER_TERM = 500
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the then to with".split()
+)
+
+
+def normalize_token(token):
+    """
+    Reduce a lowercase token to its index form by stripping simple plurals.
+
+    Args:
+        token (str): A lowercase alphanumeric token.
+
+    Returns:
+        str: The normalized token ("eggs" -> "egg", "tomatoes" -> "tomato").
+    """
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Split text into normalized search tokens, dropping stop words.
+
+    Args:
+        text (str): Free text to tokenize.
+
+    Returns:
+        list[str]: The tokens in order of appearance.
+    """
+    max_length = SearchTerm._meta.get_field("term").max_length
+    return [
+        normalize_token(token)[:max_length]
+        for token in TOKEN_RE.findall((text or "").lower())
+        if token not in STOP_WORDS and len(token) > 1
+    ]
+
+
+def recipe_terms(recipe):
+    """
+    Count the indexed terms of a recipe.
+
+    Args:
+        recipe (Recipe): The recipe to tokenize.
+
+    Returns:
+        Counter: Term -> frequency, with title tokens weighted by TITLE_WEIGHT.
+    """
+    terms = Counter()
+    for _ in range(TITLE_WEIGHT):
+        terms.update(tokenize(recipe.title))
+    terms.update(tokenize(recipe.ingredients))
+    terms.update(tokenize(recipe.instructions))
+    return terms
+
+
+def _stats():
+    stats, _ = SearchStats.objects.get_or_create(pk=1)
+    return stats
+
+
+def _average_length(document_count, total_length):
+    return (total_length / document_count if document_count else 0) or 1.0
+
+
+def _impact(frequency, length, average_length):
+    """BM25 weight of a term in a recipe, before multiplying by the term's idf."""
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+    return frequency * (BM25_K1 + 1) / (frequency + norm)
+
+
+@transaction.atomic
+def index_recipe(recipe):
+    """
+    Add or refresh a recipe in the inverted index.
+
+    Only the difference between the stored postings and the current text is
+    written, so re-saving an unchanged recipe costs a single read.
+
+    Args:
+        recipe (Recipe): A saved recipe.
+    """
+    terms = recipe_terms(recipe)
+    existing = {
+        posting.term.term: posting
+        for posting in SearchPosting.objects.filter(recipe=recipe).select_related("term")
+    }
+    old_length = 0
+    if existing:
+        old_length = Recipe.objects.filter(pk=recipe.pk).values_list("search_length", flat=True)[0]
+    new_length = sum(terms.values())
+    # The corpus average as it will be once this recipe is counted.
+    stats = _stats()
+    average_length = _average_length(
+        stats.document_count + (0 if existing else 1), stats.total_length - old_length + new_length
+    )
+
+    removed = [posting for term, posting in existing.items() if term not in terms]
+    if removed:
+        SearchTerm.objects.filter(pk__in=[p.term_id for p in removed]).update(
+            doc_frequency=F("doc_frequency") - 1
+        )
+        SearchPosting.objects.filter(pk__in=[p.pk for p in removed]).delete()
+
+    added = [term for term in terms if term not in existing]
+    if added:
+        known = dict(SearchTerm.objects.filter(term__in=added).values_list("term", "pk"))
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term) for term in added if term not in known],
+            ignore_conflicts=True,
+        )
+        term_ids = dict(SearchTerm.objects.filter(term__in=added).values_list("term", "pk"))
+        SearchTerm.objects.filter(pk__in=term_ids.values()).update(
+            doc_frequency=F("doc_frequency") + 1
+        )
+        SearchPosting.objects.bulk_create(
+            [
+                SearchPosting(
+                    term_id=term_ids[term],
+                    recipe=recipe,
+                    term_frequency=terms[term],
+                    impact=_impact(terms[term], new_length, average_length),
+                )
+                for term in added
+            ]
+        )
+
+    # A new length changes the impact of every posting of the recipe.
+    changed = [
+        posting
+        for term, posting in existing.items()
+        if term in terms and (posting.term_frequency != terms[term] or new_length != old_length)
+    ]
+    for posting in changed:
+        posting.term_frequency = terms[posting.term.term]
+        posting.impact = _impact(posting.term_frequency, new_length, average_length)
+    if changed:
+        SearchPosting.objects.bulk_update(changed, ["term_frequency", "impact"])
+
+    if not existing or new_length != old_length:
+        Recipe.objects.filter(pk=recipe.pk).update(search_length=new_length)
+        recipe.search_length = new_length
+        stats = SearchStats.objects.filter(pk=stats.pk)
+        if existing:
+            stats.update(total_length=F("total_length") + new_length - old_length)
+        else:
+            stats.update(
+                document_count=F("document_count") + 1,
+                total_length=F("total_length") + new_length,
+            )
+
+
+@transaction.atomic
+def unindex_recipe(recipe):
+    """
+    Remove a recipe from the inverted index.
+
+    Must run before the recipe row is deleted, while its postings still exist.
+
+    Args:
+        recipe (Recipe): The recipe being deleted.
+    """
+    postings = SearchPosting.objects.filter(recipe=recipe)
+    term_ids = list(postings.values_list("term_id", flat=True))
+    if not term_ids:
+        return
+    SearchTerm.objects.filter(pk__in=term_ids).update(doc_frequency=F("doc_frequency") - 1)
+    postings.delete()
+    SearchStats.objects.filter(pk=_stats().pk).update(
+        document_count=F("document_count") - 1,
+        total_length=F("total_length") - recipe.search_length,
+    )
+
+
+@transaction.atomic
+def rebuild_index():
+    """
+    Drop and rebuild the whole index from the recipe table.
+
+    Returns:
+        int: The number of recipes indexed.
+    """
+    SearchPosting.objects.all().delete()
+    SearchTerm.objects.all().delete()
+    SearchStats.objects.all().delete()
+    count = 0
+    for recipe in Recipe.objects.iterator():
+        index_recipe(recipe)
+        count += 1
+    # Recipes indexed early were scored against a partial corpus.
+    refresh_impacts()
+    return count
+
+
+@transaction.atomic
+def refresh_impacts(batch_size=1000):
+    """
+    Recompute every posting's impact against the current average recipe length.
+
+    Args:
+        batch_size (int): Postings written per UPDATE.
+
+    Returns:
+        int: The number of postings rescored.
+    """
+    stats = _stats()
+    average_length = _average_length(stats.document_count, stats.total_length)
+    postings = SearchPosting.objects.select_related("recipe").only(
+        "pk", "term_frequency", "recipe__search_length"
+    )
+    batch, count = [], 0
+    for posting in postings.iterator(chunk_size=batch_size):
+        posting.impact = _impact(posting.term_frequency, posting.recipe.search_length, average_length)
+        batch.append(posting)
+        if len(batch) >= batch_size:
+            SearchPosting.objects.bulk_update(batch, ["impact"])
+            count += len(batch)
+            batch = []
+    SearchPosting.objects.bulk_update(batch, ["impact"])
+    return count + len(batch)
+
+
+def search(query, limit=None):
+    """
+    Rank recipes matching a free-text query with BM25.
+
+    Each term contributes its ``CANDIDATES_PER_TERM`` best postings (by stored
+    impact, read from the ``(term, -impact)`` index); the candidates are then
+    scored exactly, so the work per query is bounded however common its terms
+    are. A recipe outside every term's best postings can be missed, which only
+    happens far below the results anyone pages to.
+
+    Args:
+        query (str): The user's search text.
+        limit (int, optional): Maximum number of results to return.
+
+    Returns:
+        list[tuple[int, float]]: (recipe id, score) pairs, best match first.
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return []
+
+    terms = dict(
+        SearchTerm.objects.filter(term__in=query_terms, doc_frequency__gt=0).values_list(
+            "pk", "doc_frequency"
+        )
+    )
+    if not terms:
+        return []
+
+    stats = _stats()
+    document_count = max(stats.document_count, 1)
+    average_length = _average_length(stats.document_count, stats.total_length)
+    per_term = max(limit or 0, CANDIDATES_PER_TERM)
+
+    postings = {}  # (term id, recipe id) -> (frequency, length)
+    for term_id in terms:
+        best = (
+            SearchPosting.objects.filter(term_id=term_id)
+            .order_by("-impact")
+            .values_list("recipe_id", "term_frequency", "recipe__search_length")[:per_term]
+        )
+        for recipe_id, frequency, length in best:
+            postings[term_id, recipe_id] = (frequency, length)
+    candidates = {recipe_id for _, recipe_id in postings}
+    if len(terms) > 1:
+        # Candidates also score for terms whose best postings they were not among.
+        missing = SearchPosting.objects.filter(term_id__in=terms, recipe_id__in=candidates).values_list(
+            "term_id", "recipe_id", "term_frequency", "recipe__search_length"
+        )
+        for term_id, recipe_id, frequency, length in missing:
+            postings.setdefault((term_id, recipe_id), (frequency, length))
+
+    scores = Counter()
+    for (term_id, recipe_id), (frequency, length) in postings.items():
+        doc_frequency = terms[term_id]
+        idf = math.log(1 + (document_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+        scores[recipe_id] += idf * _impact(frequency, length, average_length)
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit] if limit else ranked
+
+
+class RankedRecipes:
+    """
+    Lazy, sliceable sequence of recipes in ranked order.
+
+    Lets ``Paginator`` page through search results while only loading the
+    recipes of the requested page from the database.
+    """
+
+    def __init__(self, ranked):
+        self.ids = [recipe_id for recipe_id, _ in ranked]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            ids = self.ids[index]
+            recipes = Recipe.objects.in_bulk(ids)
+            return [recipes[recipe_id] for recipe_id in ids if recipe_id in recipes]
+        return Recipe.objects.get(pk=self.ids[index])
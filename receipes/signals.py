@@ -0,0 +1,144 @@
+# signals.py
+"""
+Model signal handlers that keep derived data in sync with recipes, ratings,
+comments and collections.
+
+Connected in ``ReceipesConfig.ready``.
+"""
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, blobs, caching, conditional, facets, fuzzy, ingredients, ratings, search, tasks
+from .models import Comment, Rating, Recipe, RecipeCollection
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_stored_values(sender, instance, raw=False, **kwargs):
+    """
+    Stash the stored (category, cooking_time) and image name so post_save can
+    move the facet count and notice a new image.
+    """
+    instance._stored_facet_values = None
+    instance._stored_image = None
+    if instance.pk and not raw:
+        stored = Recipe.objects.filter(pk=instance.pk).values_list("category", "cooking_time", "image").first()
+        if stored:
+            instance._stored_facet_values = stored[:2]
+            instance._stored_image = stored[2]
+
+
+@receiver(post_save, sender=Recipe)
+def update_facet_counts(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stored = getattr(instance, "_stored_facet_values", None)
+    current = (instance.category, instance.cooking_time)
+    if stored is None or created:
+        facets.adjust_count(*current, 1)
+    elif (stored[0], facets.time_bucket(stored[1])) != (current[0], facets.time_bucket(current[1])):
+        facets.adjust_count(*stored, -1)
+        facets.adjust_count(*current, 1)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_on_save(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata: leave this to the rebuild/backfill management commands
+        return
+    search.index_recipe(instance)
+    fuzzy.index_title(instance)
+    ingredients.sync_recipe_ingredients(instance)
+    autocomplete.index.update_recipe(instance)
+    caching.invalidate_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_references(sender, instance, created, raw=False, **kwargs):
+    """
+    Move the image reference counts when the image is added, replaced or
+    cleared, and hand a new upload to the background processing task.
+    """
+    if raw:  # loaddata: repair with dedupe_recipe_images
+        return
+    stored = (None if created else getattr(instance, "_stored_image", None)) or ""
+    current = instance.image.name or ""
+    if current == stored:
+        return
+    blobs.acquire(current)
+    blobs.release(stored)
+    instance.image_status = Recipe.IMAGE_PROCESSING if current else Recipe.IMAGE_READY
+    Recipe.objects.filter(pk=instance.pk).update(image_status=instance.image_status)
+    transaction.on_commit(lambda: tasks.process_recipe_image.delay(instance.pk))
+
+
+@receiver(pre_delete, sender=Recipe)
+def unindex_recipe_on_delete(sender, instance, **kwargs):
+    search.unindex_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_autocomplete(sender, instance, **kwargs):
+    autocomplete.index.remove_recipe(instance.pk)
+    blobs.release(instance.image.name)
+    facets.adjust_count(instance.category, instance.cooking_time, -1)
+    caching.invalidate_recipe(instance.pk)
+
+
+@receiver(pre_save, sender=Rating)
+def remember_rating_score(sender, instance, raw=False, **kwargs):
+    """Stash the stored (recipe id, score) so post_save can adjust the aggregates."""
+    instance._stored_score = None if raw else ratings.stored_score(instance)
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_aggregates(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata: repair with recompute_rating_aggregates
+        return
+    stored = getattr(instance, "_stored_score", None)
+    if stored is None:
+        ratings.apply_change(instance.recipe_id, new_score=instance.score)
+    elif stored[0] != instance.recipe_id:
+        ratings.apply_change(stored[0], old_score=stored[1])
+        ratings.apply_change(instance.recipe_id, new_score=instance.score)
+    else:
+        ratings.apply_change(instance.recipe_id, old_score=stored[1], new_score=instance.score)
+    instance._stored_score = (instance.recipe_id, instance.score)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    ratings.apply_change(instance.recipe_id, old_score=instance.score)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_commented_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        conditional.touch_recipe(instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeCollection)
+@receiver(post_delete, sender=RecipeCollection)
+def invalidate_user_collections(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_version(caching.collections_version_key(instance.user_id))
+
+
+@receiver(m2m_changed, sender=RecipeCollection.recipes.through)
+def invalidate_collection_contents(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump the collections version of every user whose collections gained or lost recipes."""
+    if not reverse:
+        if action.startswith("post_"):
+            caching.bump_version(caching.collections_version_key(instance.user_id))
+        return
+    # recipe.collections.add/remove/clear: pk_set holds collection ids (None on clear)
+    if action == "pre_clear":
+        instance._cleared_collection_users = set(instance.collections.values_list("user_id", flat=True))
+    elif action == "post_clear":
+        for user_id in getattr(instance, "_cleared_collection_users", ()):
+            caching.bump_version(caching.collections_version_key(user_id))
+    elif action in ("post_add", "post_remove"):
+        user_ids = RecipeCollection.objects.filter(pk__in=pk_set).values_list("user_id", flat=True)
+        for user_id in set(user_ids):
+            caching.bump_version(caching.collections_version_key(user_id))
@@ -0,0 +1,69 @@
+# smtpsink.py
+"""
+A local SMTP server that accepts and discards every message.
+
+It speaks just enough SMTP (no TLS, no authentication) for Django's SMTP
+backend, and counts sessions and messages, so mail throughput can be measured
+offline: run ``manage.py smtp_sink`` and point EMAIL_HOST/EMAIL_PORT at it
+with EMAIL_USE_TLS=False, or use ``manage.py benchmark_mail``.
+"""
+
+import socketserver
+import threading
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.count("sessions")
+        self.reply("220 smtp-sink ready")
+        for line in self.rfile:
+            command = line[:8].strip().upper()
+            if command.startswith((b"EHLO", b"HELO")):
+                self.reply("250 smtp-sink")
+            elif command == b"DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data_line in self.rfile:
+                    if data_line.rstrip(b"\r\n") == b".":
+                        break
+                else:
+                    return  # client went away mid-message
+                self.server.count("messages")
+                self.reply("250 OK: discarded")
+            elif command == b"QUIT":
+                self.reply("221 Bye")
+                return
+            elif command == b"STARTTLS":
+                self.reply("502 TLS not supported")
+            else:  # MAIL, RCPT, RSET, NOOP, ...
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Threaded SMTP sink.
+
+    Attributes:
+        sessions (int): Connections accepted so far.
+        messages (int): Messages received so far.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 1025)):
+        super().__init__(address, _SinkHandler)
+        self.sessions = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    def count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def start(self):
+        """Serve from a daemon thread; returns the (host, port) actually bound."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
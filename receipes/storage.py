@@ -0,0 +1,72 @@
+# storage.py
+"""
+Content-addressed storage for recipe images.
+
+An upload is stored under the SHA-256 of its bytes instead of its file name
+(``recipes/dish.jpg`` -> ``recipes/3f/3fa9...c1.jpg``), so the same photo
+uploaded for several recipes, or several times, is written once, and a stored
+file never changes: its URL can be cached forever.
+
+Files are shared between recipes, so they are never deleted when a recipe
+changes; ``blobs.py`` reference-counts them and garbage-collects the ones no
+recipe uses any more.
+"""
+
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.\w+$")
+EXTENSION_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg"}
+
+
+def content_hash(content):
+    """
+    Return the SHA-256 hex digest of a file's contents.
+
+    Args:
+        content (File): An open Django file.
+
+    Returns:
+        str: The digest.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    """True if a stored file name was produced by ``ContentAddressedStorage``."""
+    return bool(name and HASHED_NAME_RE.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files after a hash of their contents.
+
+    The directory of the requested name (the field's ``upload_to``) is kept and
+    the file goes into a subdirectory named after the first two hex digits of
+    the hash, so no directory grows too large.
+    """
+
+    def hashed_name(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        extension = EXTENSION_ALIASES.get(extension, extension)
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], f"{digest}{extension}").replace("\\", "/")
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):  # identical bytes already stored
+            return name
+        return super()._save(name, content)
+
+
+recipe_image_storage = ContentAddressedStorage()
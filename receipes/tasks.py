@@ -1,26 +1,59 @@
 # tasks.py
 
 from celery import shared_task
-from .models import Notification, User
-from django.core.mail import send_mail
-from django.conf import settings
+from celery.signals import worker_process_shutdown
+from . import blobs, images, leaderboard, mailpool, notifications
+from .models import Recipe
 
 @shared_task
 def send_notification(recipient_id, message):
-    recipient = User.objects.get(id=recipient_id)
-    # sender = User.objects.get(id=sender_id)
-
-    # Create notification
-    Notification.objects.create(
-        recipient=recipient,
-        message=message
-    )
-
-    # Send email notification
-    send_mail(
-        'New Notification',
-        message,
-        settings.DEFAULT_FROM_EMAIL,  # Use the default from email configured in settings
-        [recipient.email],
-        fail_silently=False,
-    )
+    """Create and email one notification."""
+    notifications.deliver([(recipient_id, None, message)])
+
+
+@shared_task
+def send_notifications(entries):
+    """Create and email many notifications at once; ``entries`` are (recipient_id, sender_id, message) triples."""
+    return notifications.deliver(entries)
+
+
+@shared_task
+def send_notification_digests(frequency):
+    """Periodic (celery beat) digest emails for users who chose ``frequency`` ("hourly" or "daily")."""
+    return notifications.send_digests(frequency)
+
+
+@worker_process_shutdown.connect
+def close_mail_connections(**kwargs):
+    """Log out of the SMTP sessions the worker kept open between tasks."""
+    mailpool.pool.close_all()
+
+
+@shared_task
+def refresh_leaderboard():
+    """Periodic (celery beat) refresh of the stored top-rated leaderboard."""
+    return leaderboard.refresh()
+
+
+@shared_task
+def process_recipe_image(recipe_id):
+    """Verify and normalize a newly uploaded recipe image, then write its variants."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:  # deleted before the task ran
+        return
+    images.process(recipe)
+
+
+@shared_task
+def generate_image_variants(recipe_id):
+    """Write the responsive JPEG/WebP variants of a recipe's image."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:  # deleted before the task ran
+        return None
+    return images.generate_variants(recipe)
+
+
+@shared_task
+def collect_image_blobs():
+    """Periodic (celery beat) deletion of recipe images no recipe uses any more."""
+    return blobs.collect()
@@ -0,0 +1,31 @@
+# uploads.py
+"""
+Upload handler that caps the size of uploaded files while they stream in.
+
+It runs first in ``FILE_UPLOAD_HANDLERS`` and drops a file once more than
+``RECIPE_IMAGE_MAX_UPLOAD_SIZE`` bytes of it have arrived, instead of letting
+the following handlers spool all of it. The field name is recorded in
+``request.rejected_uploads`` so the form can report the error.
+"""
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+            if self.request is not None:
+                if not hasattr(self.request, "rejected_uploads"):
+                    self.request.rejected_uploads = set()
+                self.request.rejected_uploads.add(self.field_name)
+            raise SkipFile
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None  # let the next handler build the file object
@@ -7,6 +7,9 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .models import Recipe, Profile, RecipeCollection, UserFollow, Notification, User
 from .models import Comment, Rating
+from . import autocomplete, caching, conditional, facets, fuzzy, ingredients, leaderboard, search
+from .notifications import mark_read
+from .pagination import CursorPage, InvalidCursor, KeysetPaginator
 
 
 from .forms import (
@@ -18,11 +21,18 @@ from .forms import (
     RecipeCollectionFormWithName,
     AddRecipeToCollectionForm,
 )
-from django.db.models import Avg
 from django.views.generic.edit import FormView
 from django.views.generic import ListView, UpdateView, DetailView
 from django.views import View
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from django.urls import reverse_lazy
+from django.http import Http404, JsonResponse
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from urllib.parse import urlencode
 
 
 import logging
@@ -201,7 +211,7 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
                 messages.success(
                     self.request, "Profile has been created and saved in the database."
                 )
-            elif "bio" in form.changed_data:
+            elif form.has_changed():
                 messages.success(self.request, "Profile has been updated.")
             else:
                 messages.info(self.request, "No changes detected.")
@@ -263,6 +273,8 @@ class ProfileDetailView(LoginRequiredMixin, DetailView):
     
 
 
+@method_decorator(cache_control(private=True, no_cache=True), name="get")
+@method_decorator(condition(etag_func=conditional.home_etag), name="get")
 class HomeView(ListView):
     """
     View for displaying a list of recipes filtered by search query.
@@ -272,35 +284,214 @@ class HomeView(ListView):
         template_name (str): The template to render for displaying recipes.
         context_object_name (str): The context variable name for the queryset of recipes.
         paginate_by (int): Number of recipes to display per page.
+
+    The unfiltered list is paginated with opaque ``cursor`` parameters keyed on
+    ``(title, id)``, so no ``COUNT(*)``/``OFFSET`` query runs and deep pages cost
+    the same as the first one. Legacy ``?page=N`` links and search results
+    (already ranked in memory) use regular page numbers.
+
+    Each page of results and each rendered card is cached under versioned keys
+    that recipe saves and deletes invalidate.
     """
 
     model = Recipe
     template_name = "home.html"
     context_object_name = "recipe"
     paginate_by = 2  # 2 recipes per page
+    cursor_ordering = ("title", "id")
+    filter_params = ("search_query", "pantry", "category", "time")  # carried over to the pagination links
+    fuzzy_results = False
 
     def get_queryset(self):
         """
-        Get the queryset of recipes optionally filtered by search query.
+        Get the queryset of recipes optionally filtered by search query or pantry.
+
+        A search query is answered from the inverted index (see ``search.py``)
+        and the results are ranked by BM25 relevance instead of by title.
+        A ``pantry`` list of ingredients on hand takes precedence and ranks
+        recipes by how much of their ingredient list it covers. The ``category``
+        and ``time`` facets narrow either result, and the facet counts for the
+        page are stored on ``self.facets``. When a search query matches nothing,
+        titles within a small edit distance are returned instead (``fuzzy.py``).
 
         Returns:
-            QuerySet: The filtered queryset of recipes.
+            QuerySet | RankedRecipes: The recipes ordered by title, or the ranked search results.
         """
         try:
             queryset = super().get_queryset()
             search_query = self.request.GET.get("search_query")
+            pantry = self.request.GET.get("pantry")
 
-            if search_query:
-                queryset = queryset.filter(title__icontains=search_query) | queryset.filter(
-                    ingredients__icontains=search_query
-                )
+            category, time_bucket = facets.clean(
+                self.request.GET.get("category"), self.request.GET.get("time")
+            )
 
-            return queryset.order_by('title')  #have returned queryset but now added order_by('title') to avoid this error Django raises an UnorderedObjectListWarning to inform you that pagination might yield inconsistent results in testcases.
+            if pantry or search_query:
+                if pantry:
+                    ranked = ingredients.recipes_for_pantry(pantry)
+                else:
+                    ranked = search.search(search_query)
+                    if not ranked:
+                        # Nothing matched exactly: try titles close to a misspelled query.
+                        ranked = fuzzy.search(search_query)
+                        self.fuzzy_results = bool(ranked)
+                ranked, self.facets = facets.filter_ranked(ranked, category, time_bucket)
+                return search.RankedRecipes(ranked)
+
+            self.facets = facets.facet_counts(category, time_bucket)
+            queryset = facets.filter_queryset(queryset, category, time_bucket)
+            return queryset.order_by(*self.cursor_ordering)  #have returned queryset but now added order_by('title') to avoid this error Django raises an UnorderedObjectListWarning to inform you that pagination might yield inconsistent results in testcases.
         except Exception as e:
             logger.error(f"Error in HomeView get_queryset method: {e}")
             # Handle exception appropriately, such as redirecting to an error page or displaying a message.
             raise  # Re-raise the exception for debugging purposes or to handle it in a higher level.
 
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate by cursor unless searching or an explicit page number is requested.
+
+        Args:
+            queryset (QuerySet | RankedRecipes): The recipes to paginate.
+            page_size (int): Number of recipes per page.
+
+        Returns:
+            tuple: (paginator, page, object_list, is_paginated) as expected by ListView.
+
+        Raises:
+            Http404: If the cursor is malformed.
+        """
+        if isinstance(queryset, search.RankedRecipes) or (
+            self.page_kwarg in self.request.GET and "cursor" not in self.request.GET
+        ):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get(self, request, *args, **kwargs):
+        """
+        Serve the list from cache when this page of these filters was built before.
+
+        A cache hit skips the search, facet and pagination queries entirely; the
+        cards come from the per-recipe fragment cache (see ``caching.py``).
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            HttpResponse: The rendered recipe list.
+        """
+        listing = cache.get(self.list_cache_key())
+        if listing is None:
+            return super().get(request, *args, **kwargs)
+        page = caching.CachedPage(listing)
+        self.object_list = page.object_list
+        context = {"view": self, "page_obj": page}
+        context.update(self.get_listing_context(listing))
+        return self.render_to_response(context)
+
+    def list_cache_key(self):
+        names = self.filter_params + ("cursor", self.page_kwarg)
+        return caching.list_cache_key({name: self.request.GET.get(name, "") for name in names})
+
+    def get_context_data(self, **kwargs):
+        """
+        Build the page links and facet options, cache them with the page's recipe ids,
+        and add the card context.
+
+        Returns:
+            dict: The template context.
+        """
+        context = super().get_context_data(**kwargs)
+        page = context["page_obj"]
+        params = {
+            name: self.request.GET[name] for name in self.filter_params if self.request.GET.get(name)
+        }
+
+        if isinstance(page, CursorPage):
+            previous_params = {"cursor": page.previous_cursor} if page.has_previous() else None
+            next_params = {"cursor": page.next_cursor} if page.has_next() else None
+        else:
+            previous_params = {"page": page.previous_page_number()} if page.has_previous() else None
+            next_params = {"page": page.next_page_number()} if page.has_next() else None
+
+        # Each facet option links to the list with that option toggled and the other filters kept.
+        for name, options in (("category", self.facets["category"]), ("time", self.facets["time"])):
+            for option in options:
+                option_params = {key: value for key, value in params.items() if key != name}
+                if not option["selected"]:
+                    option_params[name] = option["value"]
+                option["query"] = urlencode(option_params)
+
+        recipes = list(page)
+        listing = {
+            "ids": [recipe.pk for recipe in recipes],
+            "previous_page_query": urlencode({**previous_params, **params}) if previous_params else "",
+            "next_page_query": urlencode({**next_params, **params}) if next_params else "",
+            "page_number": getattr(page, "number", None),
+            "num_pages": page.paginator.num_pages if getattr(page, "number", None) else None,
+            "facets": self.facets,
+            "fuzzy_results": self.fuzzy_results,
+        }
+        cache.set(self.list_cache_key(), listing, caching.LIST_TIMEOUT)
+        context.update(self.get_listing_context(listing, recipes))
+        return context
+
+    def get_listing_context(self, listing, recipes=None):
+        """
+        Turn a (possibly cached) listing into template context.
+
+        Args:
+            listing (dict): Page ids, pagination links and facets.
+            recipes (list[Recipe], optional): The page's recipes, when already loaded.
+
+        Returns:
+            dict: Context with ``cards`` and, for logged-in users, their collections.
+        """
+        context = {key: value for key, value in listing.items() if key != "ids"}
+        cards = caching.recipe_cards(listing["ids"], recipes)
+
+        # The current user's collections are loaded once; which of them already
+        # hold each recipe on the page comes from a single query on the join table.
+        if self.request.user.is_authenticated:
+            context["user_collections"] = list(self.request.user.collections.order_by("name"))
+            saved = list(
+                RecipeCollection.recipes.through.objects.filter(
+                    recipecollection__user=self.request.user, recipe_id__in=listing["ids"]
+                ).values_list("recipe_id", "recipecollection_id")
+            )
+            for card in cards:
+                card["saved_collection_ids"] = {
+                    collection_id for recipe_id, collection_id in saved if recipe_id == card["pk"]
+                }
+        context["cards"] = cards
+        return context
+
+
+
+def autocomplete_view(request):
+    """
+    Return search-box completions for the typed prefix as JSON.
+
+    Served from the in-memory prefix index (see ``autocomplete.py``), so a
+    lookup does not query the database.
+
+    Args:
+        request (HttpRequest): The request; ``q`` is the prefix and ``limit`` the optional result count.
+
+    Returns:
+        JsonResponse: ``{"results": [{"text": ..., "type": "recipe" | "ingredient"}, ...]}``.
+    """
+    try:
+        limit = min(int(request.GET.get("limit", autocomplete.DEFAULT_LIMIT)), autocomplete.MAX_LIMIT)
+    except ValueError:
+        limit = autocomplete.DEFAULT_LIMIT
+    results = autocomplete.index.complete(request.GET.get("q", ""), limit=max(limit, 1))
+    return JsonResponse({"results": results})
 
 
 class LogoutView(View):
@@ -380,7 +571,9 @@ class CreateRecipeView(LoginRequiredMixin, View):
         Returns:
             HttpResponse: Redirects to recipe detail page on successful creation or renders form with errors.
         """
-        form = RecipeForm(request.POST, request.FILES)
+        form = RecipeForm(
+            request.POST, request.FILES, rejected_uploads=getattr(request, "rejected_uploads", ())
+        )
         try:
             if form.is_valid():
                 recipe = form.save(commit=False)
@@ -431,7 +624,10 @@ class UpdateRecipeView(LoginRequiredMixin, View):
             HttpResponse: Redirects to recipe detail page on successful update or renders form with errors.
         """
         recipe = get_object_or_404(Recipe, pk=pk)
-        form = RecipeForm(request.POST, request.FILES, instance=recipe)
+        form = RecipeForm(
+            request.POST, request.FILES, instance=recipe,
+            rejected_uploads=getattr(request, "rejected_uploads", ()),
+        )
         try:
             if form.is_valid():
                 form.save()
@@ -526,6 +722,46 @@ class UserRecipesView(LoginRequiredMixin, ListView):
             return render(request, self.template_name, {"recipes": Recipe.objects.none()})
 
 
+class TopRatedView(ListView):
+    """
+    View for the top-rated leaderboard, overall or within one category.
+
+    Reads the ranks materialized by the ``refresh_leaderboard`` task instead of
+    aggregating ratings on each request.
+
+    Attributes:
+        template_name (str): The path to the template used to render the leaderboard.
+        context_object_name (str): The name of the entries list in the template.
+        paginate_by (int): Number of entries to display per page.
+    """
+
+    template_name = "top_rated.html"
+    context_object_name = "entries"
+    paginate_by = 20
+
+    def get_queryset(self):
+        """
+        Return the leaderboard entries in rank order.
+
+        Returns:
+            QuerySet: ``LeaderboardEntry`` rows, limited to ``?category=`` when it is valid.
+        """
+        self.category, _ = facets.clean(self.request.GET.get("category"), None)
+        return leaderboard.entries(self.category)
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the category choices and the selected category.
+
+        Returns:
+            dict: Context data for the template.
+        """
+        context = super().get_context_data(**kwargs)
+        context["categories"] = Recipe.CATEGORY_CHOICES
+        context["category"] = self.category
+        return context
+
+
         
 @login_required
 def add_recipe_to_collection(request, recipe_id):
@@ -671,19 +907,67 @@ def user_following(request, user_id):
     return render(request, "user_following.html", context)
 
 
+NOTIFICATIONS_PAGE_SIZE = 20
+
+
 @login_required
 def notifications(request):
-    user_notifications = Notification.objects.filter(recipient=request.user).order_by(
-        "-created_at"
-    )
-    return render(request, "notifications.html", {"notifications": user_notifications})
+    """
+    Show one page of the user's notifications, newest first, optionally unread only.
+
+    Pages are fetched by cursor (see ``KeysetPaginator``) along the
+    ``(recipient, read, created_at, id)`` or ``(recipient, created_at, id)``
+    index, so every page costs the same indexed query however deep it is.
+
+    Args:
+        request (HttpRequest): The request; ``?unread=1`` keeps unread notifications only
+            and ``?cursor=`` selects the page.
+
+    Returns:
+        HttpResponse: The rendered inbox.
+
+    Raises:
+        Http404: If the cursor is malformed.
+    """
+    unread_only = request.GET.get("unread") == "1"
+    user_notifications = Notification.objects.filter(recipient=request.user).select_related("sender")
+    if unread_only:
+        user_notifications = user_notifications.filter(read=False)
+    paginator = KeysetPaginator(user_notifications, NOTIFICATIONS_PAGE_SIZE, ordering=("-created_at", "-id"))
+    try:
+        page = paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+
+    params = {"unread": "1"} if unread_only else {}
+    context = {
+        "notifications": page,
+        "unread_only": unread_only,
+        "previous_page_query": urlencode({**params, "cursor": page.previous_cursor}) if page.has_previous() else "",
+        "next_page_query": urlencode({**params, "cursor": page.next_cursor}) if page.has_next() else "",
+    }
+    return render(request, "notifications.html", context)
 
 
 @login_required
 def mark_notification_as_read(request, notification_id):
-    notification = get_object_or_404(Notification, pk=notification_id)
-    notification.read = True
-    notification.save()
+    mark_read(request.user, [notification_id])
+    return redirect("notifications")
+
+
+@login_required
+@require_POST
+def mark_notifications_read(request):
+    """
+    Mark the notifications selected in the inbox read, or all of them when the
+    form says ``all=1``, with a single UPDATE. Nothing selected marks nothing.
+    """
+    if request.POST.get("all") == "1":
+        mark_read(request.user)
+    else:
+        selected = [int(value) for value in request.POST.getlist("notification_ids") if value.isdigit()]
+        if selected:
+            mark_read(request.user, selected)
     return redirect("notifications")
 
 
@@ -736,23 +1020,174 @@ def delete_comment(request, comment_id):
     return render(request, "delete_comment.html", {"comment": comment})
 
 
+COMMENTS_PAGE_SIZE = 10
+RATINGS_PAGE_SIZE = 10
+
+
+def comment_page(recipe, cursor=None):
+    """
+    Fetch one page of a recipe's comments, newest first, with their authors.
+
+    Args:
+        recipe (Recipe): The recipe whose comments to list.
+        cursor (str, optional): Cursor from a previous page.
+
+    Returns:
+        CursorPage: The comments page.
+    """
+    comments = Comment.objects.filter(recipe=recipe).select_related("author")
+    return KeysetPaginator(comments, COMMENTS_PAGE_SIZE, ordering=("-created_at", "-id")).page(cursor)
+
+
+def rating_page(recipe, cursor=None):
+    """
+    Fetch one page of a recipe's ratings, newest first, with their authors.
+
+    Args:
+        recipe (Recipe): The recipe whose ratings to list.
+        cursor (str, optional): Cursor from a previous page.
+
+    Returns:
+        CursorPage: The ratings page.
+    """
+    ratings = Rating.objects.filter(recipe=recipe).select_related("author")
+    return KeysetPaginator(ratings, RATINGS_PAGE_SIZE, ordering=("-id",)).page(cursor)
+
+
+def render_items(objects, template_name, name):
+    """
+    Render the user-independent body of each comment or rating.
+
+    Args:
+        objects (Iterable[Model]): Comments or ratings with their authors loaded.
+        template_name (str): Template rendering one object.
+        name (str): Context name of the object in that template.
+
+    Returns:
+        list[dict]: ``{"pk": ..., "author_id": ..., "html": ...}`` per object; the
+        item templates add the viewer's own edit/delete buttons around ``html``.
+    """
+    return [
+        {"pk": obj.pk, "author_id": obj.author_id, "html": render_to_string(template_name, {name: obj})}
+        for obj in objects
+    ]
+
+
+def recipe_page(pk, updated_at, recipe=None):
+    """
+    Return the shared, user-independent part of a recipe page, cached per recipe version.
+
+    ``updated_at`` changes on recipe edits and on comment and rating activity
+    (see conditional.py), so it versions the entry and no explicit invalidation
+    is needed.
+
+    Args:
+        pk (int): Primary key of the recipe.
+        updated_at (datetime): The recipe's current ``updated_at``.
+        recipe (Recipe, optional): The recipe, if already loaded.
+
+    Returns:
+        dict: Title, author id, rendered body and the first page of comments and ratings.
+
+    Raises:
+        Http404: If the recipe does not exist.
+    """
+    key = caching.recipe_page_key(pk, updated_at)
+    page = cache.get(key)
+    if page is None:
+        if recipe is None:
+            recipe = get_object_or_404(Recipe.objects.select_related("author"), pk=pk)
+        comments = comment_page(recipe)
+        ratings = rating_page(recipe)
+        average_rating = round(recipe.average_rating, 2) if recipe.rating_count else "No ratings yet"
+        page = {
+            "pk": recipe.pk,
+            "title": recipe.title,
+            "author_id": recipe.author_id,
+            "image_status": recipe.image_status,
+            "body": render_to_string(
+                "recipe_detail_body.html", {"recipe": recipe, "average_rating": average_rating}
+            ),
+            "comments": render_items(comments, "comment_body.html", "comment"),
+            "comments_next_cursor": comments.next_cursor,
+            "ratings": render_items(ratings, "rating_body.html", "rating"),
+            "ratings_next_cursor": ratings.next_cursor,
+        }
+        cache.set(key, page, caching.PAGE_TIMEOUT)
+    page["body"] = mark_safe(page["body"])
+    for item in page["comments"] + page["ratings"]:
+        item["html"] = mark_safe(item["html"])
+    return page
+
+
+@login_required
+def recipe_comments_page(request, pk):
+    """
+    Return the next page of comments as an HTML fragment for the "load more" button.
+
+    Args:
+        request (HttpRequest): The request; ``cursor`` addresses the page.
+        pk (int): Primary key of the recipe.
+
+    Returns:
+        JsonResponse: ``{"html": ..., "next_cursor": ...}``.
+    """
+    recipe = get_object_or_404(Recipe.objects.only("pk"), pk=pk)
+    try:
+        page = comment_page(recipe, request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    items = render_items(page, "comment_body.html", "comment")
+    html = render_to_string("comment_items.html", {"comments": items}, request=request)
+    return JsonResponse({"html": html, "next_cursor": page.next_cursor})
+
+
 @login_required
+def recipe_ratings_page(request, pk):
+    """
+    Return the next page of ratings as an HTML fragment for the "load more" button.
+
+    Args:
+        request (HttpRequest): The request; ``cursor`` addresses the page.
+        pk (int): Primary key of the recipe.
+
+    Returns:
+        JsonResponse: ``{"html": ..., "next_cursor": ...}``.
+    """
+    recipe = get_object_or_404(Recipe.objects.only("pk"), pk=pk)
+    try:
+        page = rating_page(recipe, request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    items = render_items(page, "rating_body.html", "rating")
+    html = render_to_string("rating_items.html", {"ratings": items}, request=request)
+    return JsonResponse({"html": html, "next_cursor": page.next_cursor})
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=conditional.recipe_etag, last_modified_func=conditional.recipe_last_modified)
 def recipe_detail(request, pk):
-    recipe = get_object_or_404(Recipe, pk=pk)
-    comments = recipe.comments.all()
-    ratings = recipe.ratings.all()
-
-    # Calculate average rating
-    average_rating = (
-        ratings.aggregate(Avg("score"))["score__avg"]
-        if ratings.exists()
-        else "No ratings yet"
-    )
+    """
+    Show a recipe and handle its comment and rating forms.
+
+    The shared part of the page comes from ``recipe_page``; only the viewer's
+    own rating and buttons are rendered per request.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        pk (int): Primary key of the recipe.
 
-    # Check if the user has already rated this recipe
-    user_rating = ratings.filter(author=request.user).first()
+    Returns:
+        HttpResponse: The rendered page, or a redirect after a successful post.
+    """
+    updated_at = conditional.recipe_last_modified(request, pk)
+    if updated_at is None:
+        raise Http404("No Recipe matches the given query.")
+    recipe = None
 
     if request.method == "POST":
+        recipe = get_object_or_404(Recipe.objects.select_related("author"), pk=pk)
         comment_form = CommentForm(request.POST)
         rating_form = RatingForm(request.POST)
 
@@ -772,6 +1207,8 @@ def recipe_detail(request, pk):
             return redirect("recipe_detail", pk=recipe.pk)
 
         if rating_form.is_valid():
+            # Check if the user has already rated this recipe
+            user_rating = Rating.objects.filter(recipe=recipe, author=request.user).first()
             if user_rating:
                 # Update existing rating
                 user_rating.score = rating_form.cleaned_data["score"]
@@ -794,20 +1231,31 @@ def recipe_detail(request, pk):
             return redirect("recipe_detail", pk=recipe.pk)
     else:
         comment_form = CommentForm()
-        rating_form = RatingForm()
+        rating_form = None
+
+    page = recipe_page(pk, updated_at, recipe)
+
+    # Per-user overlay on top of the cached page
+    is_author = page["author_id"] == request.user.id
+    user_score = None
+    if not is_author:
+        user_score = (
+            Rating.objects.filter(recipe_id=pk, author=request.user).values_list("score", flat=True).first()
+        )
+    if rating_form is None:
+        rating_form = RatingForm(initial={"score": user_score})
 
-    # Render template with recipe details, comments, and comment form
     return render(
         request,
         "recipe_detail.html",
         {
-            "recipe": recipe,
-            "comments": comments,
+            "page": page,
+            "comments": page["comments"],
+            "ratings": page["ratings"],
+            "is_author": is_author,
+            "user_score": user_score,
             "comment_form": comment_form,
-            "ratings": ratings,
-            "average_rating": average_rating,
             "rating_form": rating_form,
-            "author_profile": recipe.author.profile,  # Pass author's profile
         },
     )
 
@@ -9,6 +9,11 @@ from receipes.forms import ProfileForm,RecipeForm,RatingForm,CommentForm,RecipeC
 from receipes.views import ProfileDetailView,UserRecipesView
 from django.http import Http404
 
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Keep files uploaded by tests out of the project's media directory."""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+
 @pytest.fixture
 def client():
     return Client()
@@ -93,6 +98,7 @@ def test_profile_update_view_post_success(client, profile_update_url):
     # Post profile update data
     updated_data = {
         'bio': 'Updated bio text',
+        'email_frequency': 'immediate',
         # Include other fields as necessary for ProfileForm
     }
     response = client.post(profile_update_url, updated_data, follow=True)
@@ -108,6 +114,17 @@ def test_profile_update_view_post_success(client, profile_update_url):
     profile.refresh_from_db()
     assert profile.bio == updated_data['bio']
 
+@pytest.mark.django_db
+def test_profile_update_view_detects_frequency_only_change(client, profile_update_url, user):
+    profile = Profile.objects.create(user=user, bio='Cook')
+    client.force_login(user)
+
+    response = client.post(profile_update_url, {'bio': 'Cook', 'email_frequency': Profile.EMAIL_DAILY}, follow=True)
+
+    assert 'Profile has been updated.' in [msg.message for msg in response.context['messages']]
+    profile.refresh_from_db()
+    assert profile.email_frequency == Profile.EMAIL_DAILY
+
 
 @pytest.fixture
 def profile_detail_url():
@@ -577,3 +594,918 @@ def test_follow_user(client, user, user_to_follow):
         assert UserFollow.objects.filter(follower=user, followed=user_to_follow).exists()
 
 
+
+
+#full-text search index
+
+from receipes import search
+from receipes.models import SearchPosting, SearchStats, SearchTerm
+
+@pytest.mark.django_db
+def test_search_ranks_by_relevance(user):
+    Recipe.objects.create(title='Egg Fried Rice', ingredients='Rice, eggs, soy sauce', instructions='Fry rice.', category='lunch', cooking_time=20, author=user)
+    omelette = Recipe.objects.create(title='Egg Omelette', ingredients='Eggs, salt', instructions='Beat eggs, cook eggs.', category='breakfast', cooking_time=10, author=user)
+    Recipe.objects.create(title='Chai', ingredients='Tea, milk', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+
+    ranked = search.search('eggs')
+
+    assert [recipe_id for recipe_id, _ in ranked][0] == omelette.id
+    assert len(ranked) == 2
+
+@pytest.mark.django_db
+def test_search_index_updates_incrementally(user):
+    recipe = Recipe.objects.create(title='Palak Paratha', ingredients='Spinach, flour', instructions='Knead and roast.', category='breakfast', cooking_time=25, author=user)
+    assert search.search('spinach')
+
+    recipe.ingredients = 'Flour, potato'
+    recipe.save()
+    assert not search.search('spinach')
+    assert search.search('potato')[0][0] == recipe.id
+    assert SearchTerm.objects.get(term='spinach').doc_frequency == 0
+
+    recipe.delete()
+    assert not SearchPosting.objects.exists()
+    stats = SearchStats.objects.get()
+    assert (stats.document_count, stats.total_length) == (0, 0)
+
+@pytest.mark.django_db
+def test_identical_recipes_get_equal_impacts(user):
+    for _ in range(5):
+        Recipe.objects.create(title='Chai', ingredients='Tea, milk', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    impacts = lambda: set(SearchPosting.objects.filter(term__term='chai').values_list('impact', flat=True))
+    assert len(impacts()) == 1
+
+    search.rebuild_index()
+    [impact] = impacts()
+    length = Recipe.objects.values_list('search_length', flat=True).first()
+    assert impact == pytest.approx(search._impact(2, length, length))
+
+@pytest.mark.django_db
+def test_search_reads_a_bounded_number_of_postings(user, monkeypatch):
+    recipes = [
+        Recipe.objects.create(title='Dal', ingredients=', '.join(['rice'] * n + ['lentils'] * (8 - n)), instructions='Boil.', category='lunch', cooking_time=30, author=user)
+        for n in range(1, 8)
+    ]
+    monkeypatch.setattr(search, 'CANDIDATES_PER_TERM', 3)
+
+    with CaptureQueriesContext(connection) as queries:
+        ranked = search.search('rice')
+
+    assert [recipe_id for recipe_id, _ in ranked] == [recipe.id for recipe in recipes[:-4:-1]]
+    assert any('LIMIT 3' in query['sql'] for query in queries)
+
+
+#keyset pagination
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+@pytest.mark.django_db
+def test_home_view_cursor_pagination(client, user):
+    for title in ['Chai', 'Aloo Paratha', 'Dosa', 'Biryani', 'Chai']:
+        Recipe.objects.create(title=title, ingredients='x', instructions='y', category='lunch', cooking_time=5, author=user)
+    expected = list(Recipe.objects.order_by('title', 'id'))
+
+    seen = []
+    query = ''
+    with CaptureQueriesContext(connection) as queries:
+        while True:
+            response = client.get(reverse('home') + '?' + query)
+            assert response.status_code == 200
+            seen.extend(response.context['page_obj'].object_list)
+            query = response.context['next_page_query']
+            if not query:
+                break
+    assert seen == expected
+    assert not any('COUNT(' in q['sql'].upper() for q in queries.captured_queries)
+
+    # walking back from the last page returns the previous page
+    response = client.get(reverse('home') + '?' + response.context['previous_page_query'])
+    assert list(response.context['page_obj'].object_list) == expected[2:4]
+
+@pytest.mark.django_db
+def test_home_view_invalid_cursor(client):
+    response = client.get(reverse('home'), {'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
+
+@pytest.mark.django_db
+def test_cursors_with_wrong_value_types_are_not_found(client, user):
+    from receipes.pagination import encode_cursor
+    client.force_login(user)
+    for values in (['Chai', 'abc'], ['Chai', None], ['Chai', [1]]):
+        assert client.get(reverse('home'), {'cursor': encode_cursor('next', values)}).status_code == 404
+    for values in (['garbage', 1], [None, 1]):
+        assert client.get(reverse('notifications'), {'cursor': encode_cursor('next', values)}).status_code == 404
+
+
+#pantry ingredients
+
+from receipes.ingredients import parse_ingredients, recipes_for_pantry
+from receipes.models import Ingredient
+
+def test_parse_ingredients():
+    assert parse_ingredients('2 cups Tomatoes (chopped), eggs; salt and pepper') == ['tomato', 'egg', 'salt', 'pepper']
+
+@pytest.mark.django_db
+def test_recipes_for_pantry_ranks_by_coverage(client, user):
+    omelette = Recipe.objects.create(title='Omelette', ingredients='Eggs, salt', instructions='Cook.', category='breakfast', cooking_time=10, author=user)
+    fried_rice = Recipe.objects.create(title='Egg Fried Rice', ingredients='Rice, eggs, soy sauce, onion', instructions='Fry.', category='lunch', cooking_time=20, author=user)
+    Recipe.objects.create(title='Chai', ingredients='Tea, milk', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+
+    ranked = recipes_for_pantry('egg, salt, rice')
+    assert [recipe_id for recipe_id, _ in ranked] == [omelette.id, fried_rice.id]
+    assert ranked[0][1] == 1.0
+
+    fried_rice.ingredients = 'Rice, eggs'
+    fried_rice.save()
+    assert dict(recipes_for_pantry(['rice', 'egg']))[fried_rice.id] == 1.0
+    assert not Ingredient.objects.get(name='onion').recipe_ingredients.exists()
+
+    response = client.get(reverse('home'), {'pantry': 'egg, salt'})
+    assert list(response.context['page_obj'].object_list) == [omelette, fried_rice]
+
+
+#autocomplete
+
+from receipes import autocomplete
+
+@pytest.mark.django_db
+def test_autocomplete_prefix_index(client, user):
+    autocomplete.index.build()
+    Recipe.objects.create(title='Aloo Paratha', ingredients='Potato, flour', instructions='Roast.', category='breakfast', cooking_time=25, author=user)
+    response = client.get(reverse('autocomplete'), {'q': 'par'})
+    assert response.json()['results'] == [{'text': 'Aloo Paratha', 'type': 'recipe'}]
+
+    # later saves update the index in place, without a rebuild
+    recipe = Recipe.objects.create(title='Palak Paratha', ingredients='Spinach, flour', instructions='Roast.', category='breakfast', cooking_time=25, author=user)
+    assert [r['text'] for r in autocomplete.index.complete('p')] == ['Aloo Paratha', 'Palak Paratha', 'potato']
+    assert autocomplete.index.complete('fl') == [{'text': 'flour', 'type': 'ingredient'}]
+
+    recipe.delete()
+    assert [r['text'] for r in autocomplete.index.complete('pa')] == ['Aloo Paratha']
+
+@pytest.mark.django_db
+def test_autocomplete_never_builds_on_a_request(user, monkeypatch, django_assert_num_queries):
+    index = autocomplete.PrefixIndex()
+    refreshes = []
+    monkeypatch.setattr(index, 'refresh', lambda: refreshes.append(1))
+    with django_assert_num_queries(0):
+        assert index.complete('al') == []
+    assert refreshes == [1]
+
+    Recipe.objects.create(title='Aloo Paratha', ingredients='Potato, flour', instructions='Roast.', category='breakfast', cooking_time=25, author=user)
+    index.build()
+    assert index.complete('al') == [{'text': 'Aloo Paratha', 'type': 'recipe'}]
+
+    # another process saved a recipe: keep answering and rebuild in the background
+    caching.bump_version(caching.AUTOCOMPLETE_VERSION_KEY)
+    monkeypatch.setattr(autocomplete, 'VERSION_CHECK_SECONDS', 0)
+    with django_assert_num_queries(0):
+        assert index.complete('pa') == [{'text': 'Aloo Paratha', 'type': 'recipe'}]
+    assert refreshes == [1, 1]
+
+@pytest.mark.django_db
+def test_autocomplete_saving_process_does_not_rebuild(user, monkeypatch, django_capture_on_commit_callbacks):
+    index = autocomplete.PrefixIndex()
+    monkeypatch.setattr(autocomplete, 'index', index)
+    monkeypatch.setattr(autocomplete, 'VERSION_CHECK_SECONDS', 0)
+    index.build()
+    refreshes = []
+    monkeypatch.setattr(index, 'refresh', lambda: refreshes.append(1))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Recipe.objects.create(title='Chai', ingredients='Tea, milk', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+
+    assert index.complete('ch') == [{'text': 'Chai', 'type': 'recipe'}]
+    assert refreshes == []
+
+
+#facets
+
+from receipes import facets
+from receipes.models import RecipeFacetCount
+
+@pytest.mark.django_db
+def test_facet_counts_are_maintained(user):
+    quick = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    Recipe.objects.create(title='Biryani', ingredients='Rice', instructions='Cook.', category='dinner', cooking_time=90, author=user)
+
+    quick.category = 'dinner'
+    quick.cooking_time = 20
+    quick.save()
+    counts = {(row.category, row.time_bucket): row.count for row in RecipeFacetCount.objects.filter(count__gt=0)}
+    assert counts == {('dinner', 'short'): 1, ('dinner', 'long'): 1}
+
+    quick.delete()
+    options = facets.facet_counts(category='dinner')
+    assert {o['value']: o['count'] for o in options['time']} == {'quick': 0, 'short': 0, 'medium': 0, 'long': 1}
+    assert {o['value']: o['count'] for o in options['category']}['dinner'] == 1
+
+@pytest.mark.django_db
+def test_home_view_facet_filter(client, user):
+    Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    biryani = Recipe.objects.create(title='Biryani', ingredients='Rice', instructions='Cook.', category='dinner', cooking_time=90, author=user)
+
+    response = client.get(reverse('home'), {'category': 'dinner', 'time': 'long'})
+    assert list(response.context['page_obj'].object_list) == [biryani]
+    assert b'Dinner (1)' in response.content
+
+    response = client.get(reverse('home'), {'search_query': 'chai', 'category': 'dinner'})
+    assert list(response.context['page_obj'].object_list) == []
+    assert {o['value']: o['count'] for o in response.context['facets']['category']}['breakfast'] == 1
+
+@pytest.mark.django_db
+def test_ranked_facets_count_a_bounded_number_of_results(user, monkeypatch):
+    monkeypatch.setattr(facets, 'MAX_RANKED', 2)
+    recipes = [
+        Recipe.objects.create(title=title, ingredients='x', instructions='y', category=category, cooking_time=5, author=user)
+        for title, category in [('Chai', 'breakfast'), ('Dal', 'lunch'), ('Biryani', 'dinner')]
+    ]
+    ranked = [(recipe.id, 3.0 - n) for n, recipe in enumerate(recipes)]
+
+    with CaptureQueriesContext(connection) as queries:
+        matching, options = facets.filter_ranked(ranked)
+
+    assert matching == ranked[:2]
+    assert {o['value']: o['count'] for o in options['category']} == {'breakfast': 1, 'lunch': 1, 'dinner': 0}
+    assert len(queries) == 1
+
+
+#home page collections
+
+@pytest.mark.django_db
+def test_home_view_collections_loaded_once(client, user):
+    client.force_login(user)
+    recipes = [
+        Recipe.objects.create(title=title, ingredients='x', instructions='y', category='lunch', cooking_time=5, author=user)
+        for title in ['Aloo Paratha', 'Biryani']
+    ]
+    favourites = RecipeCollection.objects.create(name='Favourites', user=user)
+    RecipeCollection.objects.create(name='Weekend', user=user)
+    favourites.recipes.add(recipes[0])
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('home'))
+    collection_queries = [q for q in queries.captured_queries if 'receipes_recipecollection' in q['sql']]
+    assert len(collection_queries) == 2
+    assert [c.name for c in response.context['user_collections']] == ['Favourites', 'Weekend']
+    assert b'Favourites (saved)' in response.content
+    assert response.content.count(b'(saved)') == 1
+
+
+#recipe list cache
+
+@pytest.mark.django_db
+def test_home_view_served_from_cache(client, user):
+    recipe = Recipe.objects.create(title='Aloo Paratha', ingredients='Potato', instructions='Roast.', category='breakfast', cooking_time=25, author=user)
+    client.get(reverse('home'), {'search_query': 'Paratha '})
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('home'), {'search_query': ' paratha'})
+    assert len(queries.captured_queries) == 0
+    assert b'Aloo Paratha' in response.content
+
+    # saving the recipe bumps its version, so the edit is visible immediately
+    recipe.title = 'Aloo Paratha Deluxe'
+    recipe.save()
+    response = client.get(reverse('home'), {'search_query': 'paratha'})
+    assert b'Aloo Paratha Deluxe' in response.content
+
+    recipe.delete()
+    response = client.get(reverse('home'), {'search_query': 'paratha'})
+    assert b'No recipes found.' in response.content
+
+def test_list_cache_key_keeps_cursors_exact():
+    from receipes.caching import list_cache_key
+    assert list_cache_key({'search_query': 'Paratha '}) == list_cache_key({'search_query': ' paratha'})
+    assert list_cache_key({'cursor': 'WyJuZXh0Il0'}) != list_cache_key({'cursor': 'wyjuzxh0il0'})
+    assert list_cache_key({'category': 'Dinner'}) != list_cache_key({'category': 'dinner'})
+
+
+#fuzzy title search
+
+from receipes import fuzzy
+
+def test_edit_distance_counts_transpositions():
+    assert fuzzy.edit_distance('paratah', 'paratha') == 1
+    assert fuzzy.edit_distance('chai', 'chai') == 0
+    assert fuzzy.edit_distance('', 'tea') == 3
+
+@pytest.mark.django_db
+def test_home_view_falls_back_to_fuzzy_search(client, user):
+    paratha = Recipe.objects.create(title='Aloo Paratha', ingredients='Potato, flour', instructions='Roast.', category='breakfast', cooking_time=25, author=user)
+    Recipe.objects.create(title='Palak Paneer', ingredients='Spinach, paneer', instructions='Cook.', category='dinner', cooking_time=30, author=user)
+
+    assert [recipe_id for recipe_id, _ in fuzzy.search('paratah')] == [paratha.id]
+
+    response = client.get(reverse('home'), {'search_query': 'paratah'})
+    assert list(response.context['page_obj'].object_list) == [paratha]
+    assert b'Showing recipes with similar titles' in response.content
+
+    paratha.title = 'Gobi Paratha'
+    paratha.save()
+    assert set(paratha.title_trigrams.values_list('trigram', flat=True)) == fuzzy.trigrams('Gobi Paratha')
+
+
+#rating aggregates
+
+from receipes import ratings as rating_aggregates
+
+@pytest.mark.django_db
+def test_rating_aggregates_follow_rating_changes(client, user, another_user):
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    Rating.objects.create(recipe=recipe, author=user, score=5)
+    rating = Rating.objects.create(recipe=recipe, author=another_user, score=2)
+
+    rating.score = 4
+    rating.save()
+    recipe.refresh_from_db()
+    assert (recipe.rating_count, recipe.rating_sum, recipe.average_rating) == (2, 9, 4.5)
+    assert [count for _, count, _ in recipe.rating_histogram] == [1, 1, 0, 0, 0]
+
+    # a stale instance saved later must not overwrite the aggregates
+    stale = Recipe.objects.get(pk=recipe.pk)
+    client.force_login(another_user)
+    client.post(reverse('delete_rating', kwargs={'rating_id': rating.pk}))
+    stale.title = 'Masala Chai'
+    stale.save()
+    recipe.refresh_from_db()
+    assert (recipe.rating_count, recipe.rating_sum, recipe.score_4_count) == (1, 5, 0)
+
+    Recipe.objects.filter(pk=recipe.pk).update(rating_count=0, rating_sum=0, score_5_count=0)
+    rating_aggregates.recompute()
+    recipe.refresh_from_db()
+    assert (recipe.rating_count, recipe.rating_sum, recipe.score_5_count) == (1, 5, 1)
+
+@pytest.mark.django_db
+def test_recipe_detail_shows_stored_average(client, user, another_user):
+    Profile.objects.create(user=user)
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    Rating.objects.create(recipe=recipe, author=another_user, score=4)
+    client.force_login(another_user)
+
+    response = client.get(reverse('recipe_detail', kwargs={'pk': recipe.pk}))
+    assert response.status_code == 200
+    assert b'4.0 (1 rating)' in response.content
+
+#comment and rating pagination
+
+from django.core.cache import cache
+
+@pytest.mark.django_db
+def test_recipe_comments_load_page_by_page(client, user, another_user):
+    Profile.objects.create(user=user)
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    Comment.objects.bulk_create([Comment(recipe=recipe, author=another_user, text=f'comment {i}') for i in range(25)])
+    client.force_login(user)
+
+    response = client.get(reverse('recipe_detail', kwargs={'pk': recipe.pk}))
+    assert len(response.context['comments']) == 10
+    assert b'comment 24' in response.content and b'comment 14' not in response.content
+
+    url = reverse('recipe_comments_page', kwargs={'pk': recipe.pk})
+    seen = [text for text in (f'comment {i}' for i in range(25)) if f'{text}<' in response.content.decode()]
+    cursor = response.context['page']['comments_next_cursor']
+    while cursor:
+        data = client.get(url, {'cursor': cursor}).json()
+        seen.extend(text for text in (f'comment {i}' for i in range(25)) if f'{text}<' in data['html'])
+        cursor = data['next_cursor']
+    assert sorted(seen) == sorted(f'comment {i}' for i in range(25))
+    assert client.get(url, {'cursor': 'bogus'}).status_code == 404
+
+@pytest.mark.django_db
+def test_recipe_detail_query_count_does_not_grow_with_comments(client, user, another_user):
+    Profile.objects.create(user=user)
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    client.force_login(user)
+    url = reverse('recipe_detail', kwargs={'pk': recipe.pk})
+
+    Comment.objects.create(recipe=recipe, author=another_user, text='first')
+    Rating.objects.create(recipe=recipe, author=another_user, score=3)
+    cache.clear()
+    with CaptureQueriesContext(connection) as few:
+        client.get(url)
+    Comment.objects.bulk_create([Comment(recipe=recipe, author=user, text='more') for _ in range(30)])
+    cache.clear()  # bulk_create sends no signals, so drop the cached page by hand
+    with CaptureQueriesContext(connection) as many:
+        client.get(url)
+    assert len(many) == len(few)
+
+#top-rated leaderboard
+
+from receipes import leaderboard
+from receipes.models import LeaderboardEntry
+
+@pytest.mark.django_db
+def test_leaderboard_prefers_many_good_ratings_over_one_perfect(user, another_user):
+    lone = Recipe.objects.create(title='Lone Star', ingredients='x', instructions='x', category='lunch', cooking_time=5, author=user)
+    steady = Recipe.objects.create(title='Steady', ingredients='x', instructions='x', category='dinner', cooking_time=5, author=user)
+    Rating.objects.create(recipe=lone, author=another_user, score=5)
+    plain = Recipe.objects.create(title='Plain', ingredients='x', instructions='x', category='dinner', cooking_time=5, author=user)
+    # simulate 50 ratings averaging 4.8 and 50 averaging 3 through the stored aggregates
+    Recipe.objects.filter(pk=steady.pk).update(rating_count=50, rating_sum=240)
+    Recipe.objects.filter(pk=plain.pk).update(rating_count=50, rating_sum=150)
+
+    assert leaderboard.refresh() == 3
+    assert [e.recipe_id for e in leaderboard.entries()] == [steady.pk, lone.pk, plain.pk]
+    assert [e.category_rank for e in leaderboard.entries('lunch')] == [1]
+
+    # only the recipe whose ratings changed is re-scored
+    Rating.objects.create(recipe=lone, author=user, score=4)
+    assert leaderboard.refresh() == 1
+    assert LeaderboardEntry.objects.get(recipe=lone).rating_count == 2
+
+    Rating.objects.filter(recipe=lone).delete()
+    leaderboard.refresh()
+    assert list(LeaderboardEntry.objects.order_by('rank').values_list('recipe_id', 'rank')) == [(steady.pk, 1), (plain.pk, 2)]
+
+@pytest.mark.django_db
+def test_top_rated_view_lists_ranked_entries(client, user, another_user):
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    Rating.objects.create(recipe=recipe, author=another_user, score=4)
+    from receipes.tasks import refresh_leaderboard
+    refresh_leaderboard()
+
+    response = client.get(reverse('top_rated'), {'category': 'breakfast'})
+    assert response.status_code == 200
+    assert [e.recipe for e in response.context['entries']] == [recipe]
+    assert not client.get(reverse('top_rated'), {'category': 'dinner'}).context['entries']
+
+#conditional GET
+
+@pytest.mark.django_db
+def test_recipe_detail_answers_304_until_the_page_changes(client, user, another_user):
+    Profile.objects.create(user=user)
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    client.force_login(another_user)
+    url = reverse('recipe_detail', kwargs={'pk': recipe.pk})
+
+    response = client.get(url)
+    etag = response['ETag']
+    assert response.status_code == 200 and 'Last-Modified' in response
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert sum('receipes_recipe' in q['sql'] for q in queries.captured_queries) == 1
+
+    Comment.objects.create(recipe=recipe, author=another_user, text='Lovely')
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+    etag = client.get(url)['ETag']
+    Rating.objects.create(recipe=recipe, author=another_user, score=4)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+@pytest.mark.django_db
+def test_home_etag_changes_with_recipes_and_collections(client, user):
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    client.force_login(user)
+    etag = client.get(reverse('home'))['ETag']
+    assert client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(reverse('home'), {'category': 'lunch'}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    RecipeCollection.objects.create(user=user, name='Drinks').recipes.add(recipe)
+    assert client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code == 200
+    etag = client.get(reverse('home'))['ETag']
+    recipe.title = 'Masala Chai'
+    recipe.save()
+    assert client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+#recipe page cache
+
+@pytest.mark.django_db
+def test_recipe_detail_serves_shared_part_from_cache_with_user_overlay(client, user, another_user):
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    comment = Comment.objects.create(recipe=recipe, author=another_user, text='Lovely <b>tea</b>')
+    Rating.objects.create(recipe=recipe, author=another_user, score=4)
+    url = reverse('recipe_detail', kwargs={'pk': recipe.pk})
+    delete_url = reverse('delete_comment', kwargs={'comment_id': comment.pk}).encode()
+
+    client.force_login(user)
+    response = client.get(url)
+    assert b'Update Recipe' in response.content and delete_url not in response.content
+
+    client.force_login(another_user)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert not any('receipes_comment' in q['sql'] for q in queries.captured_queries)
+    assert b'Update Recipe' not in response.content and delete_url in response.content
+    assert b'Your rating: 4' in response.content
+    assert b'Lovely &lt;b&gt;tea&lt;/b&gt;' in response.content
+
+    comment.text = 'Edited'
+    comment.save()
+    assert b'Edited' in client.get(url).content
+
+#responsive image variants
+
+import io
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from receipes import images
+
+def make_upload(name='dish.jpg', size=(1600, 1200), format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{format.lower()}')
+
+@pytest.mark.django_db
+def test_image_variants_are_generated_and_used_in_srcset(settings, tmp_path, user):
+    settings.MEDIA_ROOT = str(tmp_path)
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user, image=make_upload())
+    assert recipe.image_srcset == ''
+
+    record = images.generate_variants(recipe)
+    assert [v['width'] for v in record['variants']] == [320, 640, 1024]
+    recipe.refresh_from_db()
+    assert (tmp_path / record['variants'][0]['webp']).exists()
+    with Image.open(tmp_path / record['variants'][1]['jpeg']) as variant:
+        assert variant.size == (640, 480)
+    assert recipe.image_webp_srcset.endswith('-1024.webp 1024w')
+    assert recipe.image_srcset.endswith(f'{recipe.image.url} 1600w')
+
+    # a replaced image keeps srcset empty until its own variants are recorded
+    recipe.image = make_upload('soup.png', (500, 400), 'PNG')
+    recipe.save()
+    assert recipe.image_srcset == ''
+    images.generate_variants(Recipe.objects.get(pk=recipe.pk))
+    recipe.refresh_from_db()
+    assert [v['width'] for v in recipe.image_variants['variants']] == [320]
+
+@pytest.mark.django_db
+def test_image_change_queues_variant_task(settings, tmp_path, user, django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path)
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user)
+    with patch('receipes.tasks.process_recipe_image.delay') as delay:
+        with django_capture_on_commit_callbacks(execute=True):
+            recipe.title = 'Masala Chai'
+            recipe.save()
+        delay.assert_not_called()
+        with django_capture_on_commit_callbacks(execute=True):
+            recipe.image = make_upload()
+            recipe.save()
+        delay.assert_called_once_with(recipe.pk)
+
+#content-addressed image storage
+
+from datetime import timedelta
+from receipes import blobs
+from receipes.models import ImageBlob
+
+@pytest.mark.django_db
+def test_identical_uploads_share_one_reference_counted_file(settings, tmp_path, user):
+    settings.MEDIA_ROOT = str(tmp_path)
+    first = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user, image=make_upload('chai.jpg'))
+    second = Recipe.objects.create(title='Chai 2', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user, image=make_upload('copy.JPEG'))
+
+    assert first.image.name == second.image.name
+    assert first.image.name.startswith('recipes/') and first.image.name.endswith('.jpg')
+    assert len(list(tmp_path.glob('recipes/*/*.jpg'))) == 1
+    assert ImageBlob.objects.get(name=first.image.name).ref_count == 2
+
+    images.generate_variants(first)
+    shared = first.image.name
+    first.image = make_upload('other.png', (400, 300), 'PNG')
+    first.save()
+    second.delete()
+    blob = ImageBlob.objects.get(name=shared)
+    assert blob.ref_count == 0 and blob.unreferenced_since is not None
+
+    assert blobs.collect() == 0  # still within the grace period
+    assert blobs.collect(grace=timedelta(0)) == 1
+    assert not (tmp_path / shared).exists()
+    assert not list(tmp_path.glob('recipes/variants/*'))
+    assert (tmp_path / first.image.name).exists()
+
+#animated images
+
+from receipes import caching
+
+@pytest.mark.django_db
+def test_animated_gif_gets_animated_webp_and_poster(settings, tmp_path, user):
+    settings.MEDIA_ROOT = str(tmp_path)
+    frames = [Image.new('RGB', (480, 360), (shade, 80, 40)) for shade in (0, 80, 160, 240)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:], duration=80, loop=0)
+    upload = SimpleUploadedFile('image.gif', buffer.getvalue(), content_type='image/gif')
+    recipe = Recipe.objects.create(title='Sizzle', ingredients='x', instructions='x', category='lunch', cooking_time=5, author=user, image=upload)
+    assert recipe.image_animation is None
+
+    record = images.generate_variants(recipe)
+    assert record['variants'] == []
+    recipe.refresh_from_db()
+    with Image.open(tmp_path / record['animated']['webp']) as webp:
+        assert webp.format == 'WEBP' and webp.n_frames == 4
+    with Image.open(tmp_path / record['animated']['poster']) as poster:
+        assert poster.format == 'JPEG' and poster.size == (480, 360)
+
+    html = caching.recipe_cards([recipe.pk])[0]['html']
+    assert recipe.image_animation['webp_url'] in html and recipe.image_animation['poster_url'] in html
+
+#off-request image processing
+
+@pytest.mark.django_db
+def test_oversized_upload_is_dropped_while_streaming(client, settings, user):
+    settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE = 1024
+    client.force_login(user)
+    data = {'title': 'Chai', 'ingredients': 'Tea', 'instructions': 'Boil.', 'category': 'breakfast', 'cooking_time': 5}
+    response = client.post(reverse('create_recipe'), {**data, 'image': make_upload(size=(800, 600))})
+    assert response.status_code == 200
+    assert 'at most' in str(response.context['form'].errors['image'])
+    assert not Recipe.objects.exists()
+
+@pytest.mark.django_db
+def test_upload_is_saved_as_processing_then_normalized(client, settings, tmp_path, user, django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.RECIPE_IMAGE_MAX_DIMENSION = 1000
+    exif = Image.Exif()
+    exif[0x0112] = 6  # orientation: rotate 90 degrees clockwise to display
+    buffer = io.BytesIO()
+    Image.new('RGB', (3000, 1500), (90, 120, 40)).save(buffer, 'JPEG', exif=exif.tobytes())
+    client.force_login(user)
+    data = {'title': 'Chai', 'ingredients': 'Tea', 'instructions': 'Boil.', 'category': 'breakfast', 'cooking_time': 5}
+
+    with patch('receipes.tasks.process_recipe_image.delay') as delay:
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(reverse('create_recipe'), {**data, 'image': SimpleUploadedFile('big.jpg', buffer.getvalue(), 'image/jpeg')})
+    recipe = Recipe.objects.get()
+    delay.assert_called_once_with(recipe.pk)
+    assert recipe.image_status == Recipe.IMAGE_PROCESSING
+    assert b'Image processing' in client.get(reverse('recipe_detail', kwargs={'pk': recipe.pk})).content
+
+    uploaded = recipe.image.name
+    images.process(recipe)
+    recipe.refresh_from_db()
+    assert recipe.image_status == Recipe.IMAGE_READY and recipe.image.name != uploaded
+    with Image.open(recipe.image.path) as normalized:
+        assert normalized.size == (500, 1000)
+        assert not normalized.getexif()
+    assert ImageBlob.objects.get(name=uploaded).ref_count == 0
+
+@pytest.mark.django_db
+def test_unreadable_upload_is_rejected_in_background(settings, tmp_path, user):
+    settings.MEDIA_ROOT = str(tmp_path)
+    upload = SimpleUploadedFile('fake.jpg', b'<html>not an image</html>', content_type='image/jpeg')
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user, image=upload)
+    images.process(recipe)
+    recipe.refresh_from_db()
+    assert recipe.image_status == Recipe.IMAGE_FAILED and not recipe.image
+
+#image placeholders and lazy loading
+
+@pytest.mark.django_db
+def test_image_placeholder_is_stored_and_rendered(client, settings, tmp_path, user):
+    settings.MEDIA_ROOT = str(tmp_path)
+    cache.clear()
+    recipe = Recipe.objects.create(title='Chai', ingredients='Tea', instructions='Boil.', category='breakfast', cooking_time=5, author=user, image=make_upload('dish.png', (900, 600), 'PNG'))
+    assert recipe.image_placeholder is None
+
+    images.generate_variants(recipe)
+    recipe.refresh_from_db()
+    assert (recipe.image_width, recipe.image_height) == (900, 600)
+    assert recipe.image_color == '#c87828'
+    assert recipe.image_lqip.startswith('data:image/jpeg;base64,') and len(recipe.image_lqip) < 1000
+    assert recipe.image_placeholder['style'].startswith('background: #c87828 url(')
+
+    client.force_login(user)
+    html = client.get(reverse('home')).content.decode()
+    assert 'loading="lazy"' in html and 'width="900" height="600"' in html and 'background: #c87828' in html
+    html = client.get(reverse('recipe_detail', kwargs={'pk': recipe.pk})).content.decode()
+    assert 'loading="eager"' in html and 'width="900" height="600"' in html
+
+#media serving
+
+from receipes import media
+
+def test_parse_range():
+    assert media.parse_range('bytes=0-99', 1000) == (0, 99)
+    assert media.parse_range('bytes=900-', 1000) == (900, 999)
+    assert media.parse_range('bytes=-100', 1000) == (900, 999)
+    assert media.parse_range('bytes=0-1,5-9', 1000) is None
+    with pytest.raises(ValueError):
+        media.parse_range('bytes=1000-', 1000)
+    with pytest.raises(ValueError):
+        media.parse_range('bytes=-100', 0)
+    with pytest.raises(ValueError):
+        media.parse_range('bytes=0-', 0)
+
+@pytest.mark.django_db
+def test_media_is_served_with_ranges_and_immutable_caching(client, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_SERVE = 'django'
+    name = f'recipes/ab/{"ab" * 32}.jpg'
+    (tmp_path / 'recipes' / 'ab').mkdir(parents=True)
+    (tmp_path / name).write_bytes(bytes(range(256)) * 4)
+    url = settings.MEDIA_URL + name
+
+    response = client.get(url)
+    assert response.status_code == 200 and response['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in response['Cache-Control'] and 'max-age=31536000' in response['Cache-Control']
+    response = client.get(url, HTTP_RANGE='bytes=10-19')
+    assert response.status_code == 206 and response['Content-Range'] == 'bytes 10-19/1024'
+    assert b''.join(response.streaming_content) == bytes(range(10, 20))
+    assert client.get(url, HTTP_RANGE='bytes=5000-').status_code == 416
+    (tmp_path / 'empty.txt').write_bytes(b'')
+    response = client.get(settings.MEDIA_URL + 'empty.txt', HTTP_RANGE='bytes=-10')
+    assert response.status_code == 416 and response['Content-Range'] == 'bytes */0'
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+
+    settings.MEDIA_SERVE = 'x-accel-redirect'
+    response = client.get(url)
+    assert response['X-Accel-Redirect'] == '/protected-media/' + name and not response.content
+    (tmp_path / 'notes.txt').write_text('hi')
+    assert 'immutable' not in client.get(settings.MEDIA_URL + 'notes.txt')['Cache-Control']
+    assert client.get(settings.MEDIA_URL + '../secret').status_code == 404
+
+#batched notifications
+
+from django.core import mail
+from receipes import notifications
+
+@pytest.mark.django_db
+def test_notifications_are_delivered_in_batches(user, django_assert_max_num_queries):
+    recipients = [mixer.blend(User, email=f'cook{i}@example.com') for i in range(5)]
+    silent = mixer.blend(User, email='')
+    entries = [(r.pk, user.pk, f'Hi {r.username}') for r in recipients] + [(silent.pk, None, 'Hi'), (10 ** 6, None, 'Gone')]
+
+    # one user lookup, then per chunk of 2: insert, counter rows, counter update, emailed_at update (+ savepoint)
+    with django_assert_max_num_queries(1 + 3 * 6):
+        created = notifications.deliver(entries, batch_size=2)
+    assert created == 6
+    assert Notification.objects.filter(sender=user).count() == 5
+    assert sorted(m.to[0] for m in mail.outbox) == sorted(r.email for r in recipients)
+
+@pytest.mark.django_db
+def test_delivered_notifications_get_their_ids_without_returning_inserts(user, monkeypatch):
+    from django.db import connection
+    monkeypatch.setattr(type(connection.features), 'can_return_rows_from_bulk_insert', False)  # as on MySQL
+    entries = [(user.pk, None, 'Same'), (user.pk, None, 'Other'), (user.pk, None, 'Same')] * 2
+    delivered = []
+    monkeypatch.setattr(notifications, '_publish', lambda chunk, usernames: delivered.extend(chunk))
+
+    notifications.deliver(entries, batch_size=3)
+
+    assert [n.pk for n in delivered] == list(Notification.objects.order_by('pk').values_list('pk', flat=True))
+    assert [n.message for n in delivered] == [message for _, _, message in entries]
+
+#notification digests
+
+@pytest.mark.django_db
+def test_digest_users_get_one_email_per_period(user):
+    daily = mixer.blend(User, email='daily@example.com')
+    Profile.objects.create(user=daily, email_frequency=Profile.EMAIL_DAILY)
+    immediate = mixer.blend(User, email='now@example.com')
+    notifications.deliver([(daily.pk, user.pk, 'First'), (daily.pk, None, 'Second'), (immediate.pk, None, 'Hi')])
+    assert [m.to for m in mail.outbox] == [['now@example.com']]
+    assert Notification.objects.filter(emailed_at__isnull=True).count() == 2
+
+    assert notifications.send_digests(Profile.EMAIL_HOURLY) == 0
+    mail.outbox.clear()
+    assert notifications.send_digests(Profile.EMAIL_DAILY) == 1
+    [digest] = mail.outbox
+    assert digest.to == ['daily@example.com'] and digest.subject == '2 new notifications'
+    assert digest.body.index('First') < digest.body.index('Second')
+    assert not Notification.objects.filter(emailed_at__isnull=True).exists()
+    assert notifications.send_digests(Profile.EMAIL_DAILY) == 0
+
+@pytest.mark.django_db
+def test_notifications_that_could_not_be_emailed_stay_pending(user, monkeypatch):
+    import smtplib
+    recipient = mixer.blend(User, email='now@example.com')
+
+    def fail(messages):
+        raise smtplib.SMTPServerDisconnected('gone')
+    monkeypatch.setattr(notifications.pool, 'send_messages', fail)
+    assert notifications.deliver([(recipient.pk, user.pk, 'Hello')]) == 1
+    assert Notification.objects.get(recipient=recipient).emailed_at is None
+
+    monkeypatch.undo()
+    assert notifications.send_digests(Profile.EMAIL_HOURLY) == 1
+    assert [m.to for m in mail.outbox] == [['now@example.com']]
+    assert Notification.objects.get(recipient=recipient).emailed_at is not None
+
+#pooled mail connections
+
+from django.core.mail import EmailMessage
+from receipes.mailpool import ConnectionPool
+from receipes.smtpsink import SMTPSink
+
+@pytest.fixture
+def smtp_sink():
+    sink = SMTPSink(('127.0.0.1', 0))
+    sink.start()
+    yield sink
+    sink.shutdown()
+    sink.server_close()
+
+def test_pool_reuses_and_reconnects_smtp_connections(smtp_sink):
+    host, port = smtp_sink.server_address
+    pool = ConnectionPool(size=1, idle_timeout=60, backend='django.core.mail.backends.smtp.EmailBackend',
+                          host=host, port=port, username='', password='', use_tls=False, use_ssl=False)
+    messages = [EmailMessage('Hi', f'Body {i}', 'a@example.com', ['b@example.com']) for i in range(3)]
+    assert pool.send_messages(messages) == 3
+    assert pool.send_messages(messages[:1]) == 1
+    assert smtp_sink.sessions == 1
+
+    with pool.connection() as connection:
+        connection.connection.close()  # the server dropped the idle session
+    assert pool.send_messages(messages) == 3
+    pool.close_all()
+    assert smtp_sink.sessions == 2 and smtp_sink.messages == 7
+
+#unread notification counter
+
+from receipes.models import NotificationCounter
+
+@pytest.mark.django_db
+def test_unread_counter_bulk_mark_read_and_recount(client, user, django_assert_num_queries):
+    cache.clear()
+    notifications.deliver([(user.pk, None, f'Note {i}') for i in range(3)])
+    first, second, third = Notification.objects.filter(recipient=user).order_by('pk')
+    assert notifications.unread_count(user.pk) == 3
+    with django_assert_num_queries(0):
+        assert notifications.unread_count(user.pk) == 3
+
+    client.force_login(user)
+    assert b'id="unread-notification-count">3<' in client.get(reverse('notifications')).content
+    client.post(reverse('mark_notifications_read'), {'notification_ids': [first.pk, second.pk]})
+    assert list(Notification.objects.filter(read=False)) == [third]
+    assert notifications.unread_count(user.pk) == 1
+    client.post(reverse('mark_notifications_read'))
+    assert notifications.unread_count(user.pk) == 1
+    client.post(reverse('mark_notifications_read'), {'all': '1'})
+    assert notifications.unread_count(user.pk) == 0
+    assert b'd-none" id="unread-notification-count">0<' in client.get(reverse('notifications')).content
+
+    Notification.objects.filter(pk=first.pk).update(read=False)
+    assert notifications.recount() == 1
+    assert NotificationCounter.objects.get(user=user).unread == 1 and notifications.unread_count(user.pk) == 1
+
+#paginated notifications inbox
+
+@pytest.mark.django_db
+def test_notifications_inbox_is_paginated_and_filterable(client, user, another_user, django_assert_max_num_queries):
+    from receipes import views
+    Notification.objects.bulk_create([
+        Notification(recipient=user, sender=another_user, message=f'Note {i}', read=i % 2 == 0)
+        for i in range(views.NOTIFICATIONS_PAGE_SIZE * 2 + 5)
+    ])
+    client.force_login(user)
+    url = reverse('notifications')
+    response = client.get(url)
+    first_page = list(response.context['notifications'])
+    assert len(first_page) == views.NOTIFICATIONS_PAGE_SIZE
+    assert all(n.sender_id == another_user.pk for n in first_page)
+
+    with django_assert_max_num_queries(6):  # session, user, page, cached counter fallbacks
+        response = client.get(url + '?' + response.context['next_page_query'])
+    second_page = list(response.context['notifications'])
+    assert not {n.pk for n in first_page} & {n.pk for n in second_page}
+    assert f'from {another_user.username}' in response.content.decode()
+
+    unread = list(client.get(url, {'unread': '1'}).context['notifications'])
+    assert unread and all(not n.read for n in unread)
+    assert client.get(url, {'cursor': 'garbage'}).status_code == 404
+
+#websocket notification push
+
+import json
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from receipes.consumers import NotificationConsumer
+
+@pytest.mark.django_db
+def test_delivered_notifications_are_pushed_to_the_users_socket(user, another_user, monkeypatch):
+    from django.db import connection
+    monkeypatch.setattr(type(connection.features), 'can_return_rows_from_bulk_insert', False)  # as on MySQL
+    cache.clear()
+    Notification.objects.create(recipient=user, message='Old')
+    NotificationCounter.objects.create(user=user, unread=1)
+    channel_layer = get_channel_layer()
+
+    async def session():
+        socket = ApplicationCommunicator(NotificationConsumer.as_asgi(), {'type': 'websocket', 'path': '/ws/notifications/', 'user': user})
+        await socket.send_input({'type': 'websocket.connect'})
+        assert (await socket.receive_output(1))['type'] == 'websocket.accept'
+        assert json.loads((await socket.receive_output(1))['text']) == {'type': 'unread_count', 'unread_count': 1}
+        await sync_to_async(notifications.deliver)([(user.pk, another_user.pk, 'Hello'), (another_user.pk, None, 'Not yours')])
+        pushed = json.loads((await socket.receive_output(1))['text'])
+        assert pushed['type'] == 'notification' and pushed['message'] == 'Hello' and pushed['sender'] == another_user.username
+        assert pushed['id'] == (await Notification.objects.aget(message='Hello')).pk
+        assert await socket.receive_nothing()
+        await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await socket.wait(1)
+
+    async_to_sync(session)()
+    async_to_sync(channel_layer.flush)()
+
+@pytest.mark.django_db
+def test_anonymous_socket_is_rejected():
+    from django.contrib.auth.models import AnonymousUser
+
+    async def session():
+        socket = ApplicationCommunicator(NotificationConsumer.as_asgi(), {'type': 'websocket', 'path': '/ws/notifications/', 'user': AnonymousUser()})
+        await socket.send_input({'type': 'websocket.connect'})
+        return await socket.receive_output(1)
+
+    assert async_to_sync(session)()['type'] == 'websocket.close'